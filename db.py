@@ -14,8 +14,9 @@ from sqlalchemy.exc import IntegrityError
 logger = logging.getLogger(__name__)
 
 class Database:
-    def __init__(self, database_url: str):
+    def __init__(self, database_url: str, engine_kwargs: Optional[Dict[str, Any]] = None):
         self.database_url = database_url
+        self.engine_kwargs = engine_kwargs or {}
         self.engine = None
         self.metadata = MetaData()
         self.SessionLocal = None
@@ -27,7 +28,7 @@ class Database:
         if self.database_url.startswith("sqlite"):
             connect_args["check_same_thread"] = False
         
-        self.engine = create_engine(self.database_url, connect_args=connect_args)
+        self.engine = create_engine(self.database_url, connect_args=connect_args, **self.engine_kwargs)
         self.SessionLocal = sessionmaker(bind=self.engine, autoflush=False, autocommit=False)
         
         # Define tables
@@ -275,6 +275,9 @@ class KrooloBot:
         """Start the bot with long-polling"""
         logger.info("🚀 Starting Kroolo Bot with long-polling...")
         
+        # Start the async error-log sink (no-op unless LOG_ASYNC_SINK is set)
+        await logger.start_async_sink()
+        
         # Start scheduler service
         await self.scheduler_service.start()
         
@@ -311,6 +314,7 @@ class KrooloBot:
         await self.application.shutdown()
         
         logger.info("✅ Bot stopped successfully")
+        await logger.stop_async_sink()
 
 async def main():
     """Main function"""
@@ -171,7 +171,7 @@ class BaseAgent(ABC):
     async def _format_response(self, response: str, context: Dict[str, Any]) -> str:
         """Format the response for Telegram."""
         try:
-            formatted = await self.formatter.format_message(
+            formatted = self.formatter.format_message(
                 text=response,
                 agent_tone=self.tone,
                 chat_type=context.get('chat_type', 'group'),
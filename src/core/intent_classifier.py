@@ -4,6 +4,7 @@ Uses both rule-based and ML-based approaches for accurate intent detection.
 """
 
 import re
+import functools
 import logging
 from typing import Dict, Any, List, Optional
 from enum import Enum
@@ -29,91 +30,105 @@ class IntentClassifier:
     """Classifies user intent from message content."""
     
     def __init__(self):
-        # Rule-based patterns
+        # Rule-based patterns, compiled once per process (copied so update_patterns
+        # stays per-instance)
         self.patterns = {
-            Intent.NEWS: [
+            intent: list(patterns)
+            for intent, patterns in IntentClassifier._cached_patterns().items()
+        }
+        
+        # Intent keywords with weights
+        self.keyword_weights = {
+            Intent.NEWS: {
+                "news": 5.0, "update": 4.0, "latest": 4.0, "breaking": 5.0,
+                "ai": 3.0, "artificial intelligence": 4.0, "research": 3.0
+            },
+            Intent.QUIZ: {
+                "quiz": 5.0, "question": 4.0, "test": 3.0, "challenge": 4.0,
+                "trivia": 4.0, "puzzle": 3.0, "game": 3.0
+            },
+            Intent.DEBATE: {
+                "debate": 5.0, "discuss": 4.0, "opinion": 4.0, "argue": 3.0,
+                "pros and cons": 4.0, "controversial": 4.0, "perspective": 3.0
+            },
+            Intent.FUN: {
+                "joke": 5.0, "funny": 4.0, "humor": 4.0, "fun fact": 5.0,
+                "entertainment": 3.0, "story": 3.0, "riddle": 4.0
+            },
+            Intent.PERSONA_CHAT: {
+                "hello": 2.0, "hi": 2.0, "explain": 3.0, "tell me": 3.0,
+                "conversation": 3.0, "philosophy": 4.0, "theory": 4.0
+            }
+        }
+        
+        # Context patterns for better classification
+        self.context_patterns = {
+            "question_mark": 2.0,  # Boost for questions
+            "exclamation": 1.5,    # Boost for exclamations
+            "mention": 3.0,        # Boost for @mentions
+            "command": 4.0,        # Boost for /commands
+            "url": 1.0,            # Slight boost for URLs
+            "emoji": 0.5           # Slight boost for emojis
+        }
+    
+    @staticmethod
+    @functools.cache
+    def _cached_patterns() -> Dict[Intent, tuple]:
+        """Built-in rule-based patterns, compiled once per process."""
+        patterns = {
+            Intent.NEWS: (
                 r'\b(news|update|latest|breaking|announcement|release)\b',
                 r'\b(ai|artificial intelligence|machine learning|deep learning)\b',
                 r'\b(what\'s new|what happened|what\'s going on)\b',
                 r'\b(today|yesterday|this week|recent)\b',
                 r'\b(technology|tech|research|paper|study)\b'
-            ],
-            Intent.QUIZ: [
+            ),
+            Intent.QUIZ: (
                 r'\b(quiz|question|test|challenge|puzzle)\b',
                 r'\b(how much|how many|what is|who is|when)\b',
                 r'\b(trivia|knowledge|learning|education)\b',
                 r'\b(play|game|fun|entertainment)\b',
                 r'\b(score|points|leaderboard|ranking)\b'
-            ],
-            Intent.DEBATE: [
+            ),
+            Intent.DEBATE: (
                 r'\b(debate|discuss|argue|opinion|viewpoint)\b',
                 r'\b(pros and cons|advantages|disadvantages)\b',
                 r'\b(agree|disagree|controversial|contention)\b',
                 r'\b(what do you think|your thoughts|perspective)\b',
                 r'\b(compare|versus|vs|difference)\b'
-            ],
-            Intent.FUN: [
+            ),
+            Intent.FUN: (
                 r'\b(joke|funny|humor|comedy|entertainment)\b',
                 r'\b(fun fact|interesting|amazing|wow|cool)\b',
                 r'\b(riddle|puzzle|brain teaser|mind game)\b',
                 r'\b(story|anecdote|tale|narrative)\b',
                 r'\b(relax|take a break|have fun|enjoy)\b'
-            ],
-            Intent.PERSONA_CHAT: [
+            ),
+            Intent.PERSONA_CHAT: (
                 r'\b(hello|hi|hey|greetings|good morning|good evening)\b',
                 r'\b(how are you|how\'s it going|what\'s up)\b',
                 r'\b(tell me about|explain|describe|what is)\b',
                 r'\b(conversation|chat|talk|discuss)\b',
                 r'\b(philosophy|theory|concept|idea)\b'
-            ],
-            Intent.HELP: [
+            ),
+            Intent.HELP: (
                 r'\b(help|support|assist|guide|tutorial)\b',
                 r'\b(how to|what can you do|capabilities|features)\b',
                 r'\b(problem|issue|error|trouble|difficulty)\b',
                 r'\b(instructions|manual|documentation|guide)\b',
                 r'\b(confused|lost|don\'t understand|unclear)\b'
-            ],
-            Intent.ADMIN: [
+            ),
+            Intent.ADMIN: (
                 r'\b(admin|administrator|moderator|owner)\b',
                 r'\b(config|configuration|settings|setup)\b',
                 r'\b(restart|reload|update|maintenance)\b',
                 r'\b(stats|statistics|metrics|performance)\b',
                 r'\b(ban|block|mute|kick|remove)\b'
-            ]
+            )
         }
-        
-        # Intent keywords with weights
-        self.keyword_weights = {
-            Intent.NEWS: {
-                "news": 5.0, "update": 4.0, "latest": 4.0, "breaking": 5.0,
-                "ai": 3.0, "artificial intelligence": 4.0, "research": 3.0
-            },
-            Intent.QUIZ: {
-                "quiz": 5.0, "question": 4.0, "test": 3.0, "challenge": 4.0,
-                "trivia": 4.0, "puzzle": 3.0, "game": 3.0
-            },
-            Intent.DEBATE: {
-                "debate": 5.0, "discuss": 4.0, "opinion": 4.0, "argue": 3.0,
-                "pros and cons": 4.0, "controversial": 4.0, "perspective": 3.0
-            },
-            Intent.FUN: {
-                "joke": 5.0, "funny": 4.0, "humor": 4.0, "fun fact": 5.0,
-                "entertainment": 3.0, "story": 3.0, "riddle": 4.0
-            },
-            Intent.PERSONA_CHAT: {
-                "hello": 2.0, "hi": 2.0, "explain": 3.0, "tell me": 3.0,
-                "conversation": 3.0, "philosophy": 4.0, "theory": 4.0
-            }
-        }
-        
-        # Context patterns for better classification
-        self.context_patterns = {
-            "question_mark": 2.0,  # Boost for questions
-            "exclamation": 1.5,    # Boost for exclamations
-            "mention": 3.0,        # Boost for @mentions
-            "command": 4.0,        # Boost for /commands
-            "url": 1.0,            # Slight boost for URLs
-            "emoji": 0.5           # Slight boost for emojis
+        return {
+            intent: tuple(re.compile(pattern, re.IGNORECASE) for pattern in intent_patterns)
+            for intent, intent_patterns in patterns.items()
         }
     
     async def classify_intent(self, text: str) -> Intent:
@@ -181,7 +196,7 @@ class IntentClassifier:
         
         for intent, patterns in self.patterns.items():
             for pattern in patterns:
-                matches = re.findall(pattern, text, re.IGNORECASE)
+                matches = pattern.findall(text)
                 if matches:
                     # Base score from pattern matches
                     scores[intent] += len(matches) * 0.5
@@ -246,7 +261,7 @@ class IntentClassifier:
         # Pattern matching score
         if intent in self.patterns:
             for pattern in self.patterns[intent]:
-                matches = re.findall(pattern, text_lower, re.IGNORECASE)
+                matches = pattern.findall(text_lower)
                 base_score += len(matches) * 0.3
         
         # Keyword weight score
@@ -297,6 +312,7 @@ class IntentClassifier:
             intent: Intent to update
             patterns: New patterns to add
         """
+        patterns = [re.compile(pattern, re.IGNORECASE) for pattern in patterns]
         if intent in self.patterns:
             self.patterns[intent].extend(patterns)
             logger.info(f"Updated patterns for intent {intent.value}")
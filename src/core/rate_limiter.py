@@ -6,7 +6,7 @@ Implements token bucket algorithm for per-user, per-chat, and global rate limiti
 import asyncio
 import time
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 
@@ -31,16 +31,23 @@ class TokenBucket:
         self.tokens = config.bucket_size
         self.last_refill = time.time()
     
-    def consume(self, tokens: int = 1) -> bool:
-        """Consume tokens from the bucket."""
-        now = time.time()
+    def consume(self, tokens: int = 1, now: Optional[float] = None) -> bool:
+        """Consume tokens from the bucket.
         
-        # Refill tokens based on time passed
-        time_passed = now - self.last_refill
-        tokens_to_add = time_passed * self.config.tokens_per_second
+        Callers checking many messages at once can pass a shared `now` so the
+        clock is read once per batch.
+        """
+        if now is None:
+            now = time.time()
         
-        self.tokens = min(self.config.bucket_size, self.tokens + tokens_to_add)
-        self.last_refill = now
+        # Refill tokens based on time passed; a shared `now` read before this
+        # bucket was created is older than last_refill and adds nothing
+        time_passed = now - self.last_refill
+        if time_passed > 0:
+            tokens_to_add = time_passed * self.config.tokens_per_second
+            
+            self.tokens = min(self.config.bucket_size, self.tokens + tokens_to_add)
+            self.last_refill = now
         
         # Check if we have enough tokens
         if self.tokens >= tokens:
@@ -136,21 +143,61 @@ class RateLimiter:
             logger.error(f"Error checking rate limit: {e}")
             return True  # Allow on error
     
+    async def check_rate_limit_batch(self, message_infos: List[Dict[str, Any]]) -> List[bool]:
+        """
+        Check a batch of messages against rate limits in one pass.
+        
+        Equivalent to calling check_rate_limit for each message in order, but
+        the clock is read once and each bucket refills once for the batch.
+        
+        Args:
+            message_infos: Message info dicts with user_id and chat_id
+            
+        Returns:
+            Per-message flags, True where the message is within limits
+        """
+        try:
+            now = time.time()
+            results = []
+            
+            for message_info in message_infos:
+                user_id = message_info.get('user_id')
+                chat_id = message_info.get('chat_id')
+                
+                if not user_id or not chat_id:
+                    results.append(True)  # Allow if we can't identify
+                    continue
+                
+                results.append(
+                    self.global_bucket.consume(now=now)
+                    and self._get_bucket(self.user_buckets, user_id, self.user_config).consume(now=now)
+                    and self._get_bucket(self.chat_buckets, chat_id, self.chat_config).consume(now=now)
+                )
+            
+            limited = results.count(False)
+            if limited:
+                logger.warning(f"{limited} of {len(results)} batched messages rate limited")
+            
+            return results
+            
+        except Exception as e:
+            logger.error(f"Error checking batch rate limit: {e}")
+            return [True] * len(message_infos)  # Allow on error
+    
+    def _get_bucket(self, buckets: Dict[int, TokenBucket], key: int,
+                    config: RateLimitConfig) -> TokenBucket:
+        """Get the bucket for a key, creating it on first use."""
+        if key not in buckets:
+            buckets[key] = TokenBucket(config)
+        return buckets[key]
+    
     async def _check_user_limit(self, user_id: int) -> bool:
         """Check user-specific rate limit."""
-        if user_id not in self.user_buckets:
-            self.user_buckets[user_id] = TokenBucket(self.user_config)
-        
-        bucket = self.user_buckets[user_id]
-        return bucket.consume()
+        return self._get_bucket(self.user_buckets, user_id, self.user_config).consume()
     
     async def _check_chat_limit(self, chat_id: int) -> bool:
         """Check chat-specific rate limit."""
-        if chat_id not in self.chat_buckets:
-            self.chat_buckets[chat_id] = TokenBucket(self.chat_config)
-        
-        bucket = self.chat_buckets[chat_id]
-        return bucket.consume()
+        return self._get_bucket(self.chat_buckets, chat_id, self.chat_config).consume()
     
     async def get_wait_time(self, user_id: int, chat_id: int) -> Dict[str, float]:
         """Get wait times for different rate limit buckets."""
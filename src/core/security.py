@@ -281,6 +281,12 @@ class SecurityManager:
             logger.warning(f"Auto-blocking user {user_id} in chat {chat_id} due to repeated violations")
             # In production, implement actual blocking logic
     
+    def reset(self):
+        """Clear blocked IPs, suspicious activities and rate limit violations."""
+        self.blocked_ips.clear()
+        self.suspicious_activities.clear()
+        self.rate_limit_violations.clear()
+    
     def get_security_report(self) -> Dict[str, Any]:
         """Get security status report."""
         return {
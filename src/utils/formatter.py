@@ -4,6 +4,7 @@ Handles safe formatting, emoji, and message presentation.
 """
 
 import re
+import random
 import logging
 from typing import Dict, Any, Optional
 
@@ -13,28 +14,72 @@ logger = logging.getLogger(__name__)
 class MessageFormatter:
     """Formats messages for Telegram with safety and style."""
     
+    # Tones and chat types that apply extra formatting passes
+    STRUCTURED_TONES = frozenset({'precise', 'enthusiastic', 'formal'})
+    STRUCTURED_CHAT_TYPES = frozenset({'group', 'channel'})
+    
+    # Shortest text any chat-type formatting pass acts on
+    MIN_CHAT_FORMAT_LENGTH = 300
+    
+    # Short texts get a leading emoji, long texts a trailing one
+    EMOJI_PREFIX_MAX_LENGTH = 100
+    EMOJI_SUFFIX_MIN_LENGTH = 200
+    
+    # Telegram message limit; truncation leaves room for the suffix and
+    # the closing markers _balance_markdown may append ('*' and '**')
+    TELEGRAM_LIMIT = 4096
+    TRUNC_SUFFIX = '…'
+    _TRUNC_LENGTH = TELEGRAM_LIMIT - len(TRUNC_SUFFIX) - 3
+    
+    # Emoji mappings for different tones
+    TONE_EMOJIS = {
+        'precise': ('🔬', '📊', '📈', '🎯', '⚡'),
+        'skeptical': ('🤔', '🧐', '🤨', '💭', '❓'),
+        'enthusiastic': ('🚀', '💡', '🎉', '🔥', '✨'),
+        'formal': ('📋', '📝', '📚', '🎓', '🏛️'),
+        'witty': ('😏', '🎭', '🎪', '🎨'),
+        'neutral': ('💬', '📱', '💻', '🌐', '📡')
+    }
+    _NEUTRAL_EMOJIS = TONE_EMOJIS['neutral']
+    
+    # Safe formatting patterns
+    SAFE_PATTERNS = {
+        'bold': re.compile(r'\*\*(.*?)\*\*'),
+        'italic': re.compile(r'\*([^*]+)\*'),
+        'code': re.compile(r'`([^`]+)`'),
+        'pre': re.compile(r'```([^`]+)```'),
+        'link': re.compile(r'\[([^\]]+)\]\(([^)]+)\)')
+    }
+    
+    # Single-pass sanitization: escape backslashes, drop null bytes,
+    # normalize line endings, and collapse runs of 3+ line breaks and 2+
+    # spaces (null bytes inside a run are ignored, matching removal first)
+    _RE_SANITIZE = re.compile(
+        r'[\r\n]\x00*[\r\n]\x00*[\r\n](?:\x00*[\r\n])*'
+        r'| (?:\x00* )+'
+        r'|[\x00\r\\]'
+    )
+    _SANITIZE_REPLACEMENTS = {'\x00': '', '\r': '\n', '\\': '\\\\'}
+    
+    # Precompiled emphasis patterns
+    _RE_ENTHUSIASM = re.compile(
+        r'\b(exciting|amazing|incredible|fantastic'
+        r'|breakthrough|innovation|revolutionary|game-changing'
+        r'|future|potential|possibilities|opportunities)\b',
+        re.IGNORECASE
+    )
+    _RE_EMPHASIS_MARKER = re.compile(r'\*\*|\*')
+    
+    # Lines the precise structure rewrites (long non-bullet or blank lines)
+    # and section padding the formal structure strips
+    _RE_PRECISE_REWRITE = re.compile(r'^(?![-•]).{51,}$|^[^\S\n]*$', re.MULTILINE)
+    _RE_SECTION_PADDING = re.compile(r'\s\n\n|\n\n\s|\s\Z')
+    
     def __init__(self):
-        # Emoji mappings for different tones
-        self.tone_emojis = {
-            'precise': ['🔬', '📊', '📈', '🎯', '⚡'],
-            'skeptical': ['🤔', '🧐', '🤨', '💭', '❓'],
-            'enthusiastic': ['🚀', '💡', '🎉', '🔥', '✨'],
-            'formal': ['📋', '📝', '📚', '🎓', '🏛️'],
-            'witty': ['😏', '🎭', '🎪', '🎨', '🎭'],
-            'neutral': ['💬', '📱', '💻', '🌐', '📡']
-        }
-        
-        # Safe formatting patterns
-        self.safe_patterns = {
-            'bold': r'\*\*(.*?)\*\*',
-            'italic': r'\*([^*]+)\*',
-            'code': r'`([^`]+)`',
-            'pre': r'```([^`]+)```',
-            'link': r'\[([^\]]+)\]\(([^)]+)\)'
-        }
+        self._rng = random.Random()
     
-    async def format_message(self, text: str, agent_tone: str = 'neutral', 
-                           chat_type: str = 'group', include_emoji: bool = True) -> str:
+    def format_message(self, text: str, agent_tone: str = 'neutral', 
+                       chat_type: str = 'group', include_emoji: bool = True) -> str:
         """
         Format a message for Telegram with appropriate styling.
         
@@ -52,14 +97,17 @@ class MessageFormatter:
             formatted_text = self._sanitize_text(text)
             
             # Apply tone-based formatting
-            formatted_text = self._apply_tone_formatting(formatted_text, agent_tone)
+            if agent_tone in self.STRUCTURED_TONES:
+                formatted_text = self._apply_tone_formatting(formatted_text, agent_tone)
             
             # Add emojis if enabled
             if include_emoji:
                 formatted_text = self._add_tone_emojis(formatted_text, agent_tone)
             
             # Apply chat-type specific formatting
-            formatted_text = self._apply_chat_formatting(formatted_text, chat_type)
+            if (chat_type in self.STRUCTURED_CHAT_TYPES
+                    and len(formatted_text) > self.MIN_CHAT_FORMAT_LENGTH):
+                formatted_text = self._apply_chat_formatting(formatted_text, chat_type)
             
             # Final safety check
             formatted_text = self._final_safety_check(formatted_text)
@@ -76,18 +124,16 @@ class MessageFormatter:
         if not text:
             return ""
         
-        # Remove potentially dangerous characters
-        text = text.replace('\x00', '')  # Null bytes
-        text = text.replace('\r', '\n')  # Normalize line endings
-        
-        # Escape backslashes
-        text = text.replace('\\', '\\\\')
-        
-        # Clean up excessive whitespace
-        text = re.sub(r'\n{3,}', '\n\n', text)
-        text = re.sub(r' {2,}', ' ', text)
-        
-        return text.strip()
+        return self._RE_SANITIZE.sub(self._sanitize_replacement, text).strip()
+    
+    @classmethod
+    def _sanitize_replacement(cls, match: re.Match) -> str:
+        """Replacement for a single _RE_SANITIZE match."""
+        token = match.group(0)
+        if len(token) == 1:
+            return cls._SANITIZE_REPLACEMENTS[token]
+        # Multi-character matches are space or line-break runs
+        return ' ' if token[0] == ' ' else '\n\n'
     
     def _apply_tone_formatting(self, text: str, tone: str) -> str:
         """Apply formatting based on agent tone."""
@@ -106,6 +152,13 @@ class MessageFormatter:
     
     def _add_precise_structure(self, text: str) -> str:
         """Add structure for precise responses."""
+        # Only the first line changes unless a later line needs rewriting
+        first_break = text.find('\n')
+        if first_break != -1:
+            first_line = text[:first_break].strip()
+            if first_line and not self._RE_PRECISE_REWRITE.search(text, first_break + 1):
+                return f"**{first_line}**{text[first_break:]}"
+        
         lines = text.split('\n')
         structured_lines = []
         
@@ -124,22 +177,19 @@ class MessageFormatter:
     
     def _add_enthusiasm(self, text: str) -> str:
         """Add emphasis for enthusiastic responses."""
-        # Add emphasis to key phrases
-        emphasis_patterns = [
-            (r'\b(exciting|amazing|incredible|fantastic)\b', r'**\1**'),
-            (r'\b(breakthrough|innovation|revolutionary|game-changing)\b', r'**\1**'),
-            (r'\b(future|potential|possibilities|opportunities)\b', r'**\1**')
-        ]
-        
-        for pattern, replacement in emphasis_patterns:
-            text = re.sub(pattern, replacement, text, flags=re.IGNORECASE)
-        
-        return text
+        # Add emphasis to key phrases in a single pass
+        return self._RE_ENTHUSIASM.sub(r'**\1**', text)
     
     def _add_formal_structure(self, text: str) -> str:
         """Add formal structure to responses."""
         if len(text) > 300:
             # Add section headers for long formal responses
+            first_break = text.find('\n\n')
+            if first_break == -1:
+                return text
+            if not self._RE_SECTION_PADDING.search(text, first_break):
+                return f"**{text[:first_break].strip()}**{text[first_break:]}"
+            
             sections = text.split('\n\n')
             if len(sections) > 1:
                 formatted_sections = []
@@ -154,19 +204,16 @@ class MessageFormatter:
     
     def _add_tone_emojis(self, text: str, tone: str) -> str:
         """Add appropriate emojis based on tone."""
-        emojis = self.tone_emojis.get(tone, self.tone_emojis['neutral'])
+        emojis = self.TONE_EMOJIS.get(tone, self._NEUTRAL_EMOJIS)
+        length = len(text)
         
         # Add emoji at the beginning if text is short
-        if len(text) < 100:
-            import random
-            emoji = random.choice(emojis)
-            text = f"{emoji} {text}"
+        if length < self.EMOJI_PREFIX_MAX_LENGTH:
+            return self._rng.choice(emojis) + ' ' + text
         
         # Add emoji at the end for longer texts
-        elif len(text) > 200:
-            import random
-            emoji = random.choice(emojis)
-            text = f"{text}\n\n{emoji}"
+        if length > self.EMOJI_SUFFIX_MIN_LENGTH:
+            return text + '\n\n' + self._rng.choice(emojis)
         
         return text
     
@@ -192,13 +239,14 @@ class MessageFormatter:
         
         # Find a good breaking point
         truncated = text[:500]
-        last_period = truncated.rfind('.')
-        last_newline = truncated.rfind('\n')
-        
-        if last_period > last_newline and last_period > 400:
-            truncated = truncated[:last_period + 1]
-        elif last_newline > 400:
-            truncated = truncated[:last_newline]
+        # Prefer the last period unless a newline follows it, else the last newline
+        head, sep, tail = truncated.rpartition('.')
+        if sep and len(head) > 400 and '\n' not in tail:
+            truncated = head + sep
+        else:
+            head, sep, _ = truncated.rpartition('\n')
+            if sep and len(head) > 400:
+                truncated = head
         
         truncated += "\n\n*[Message truncated for group chat. Send me a private message for the full response.]*"
         return truncated
@@ -207,40 +255,44 @@ class MessageFormatter:
         """Add structure for channel posts."""
         if len(text) > 300:
             # Add a summary line at the top
-            lines = text.split('\n')
-            if lines:
-                first_line = lines[0]
-                if len(first_line) > 100:
-                    summary = first_line[:100] + "..."
-                    lines.insert(0, f"**📋 Summary:** {summary}")
-                    text = '\n'.join(lines)
+            first_break = text.find('\n')
+            first_line = text if first_break == -1 else text[:first_break]
+            if len(first_line) > 100:
+                summary = first_line[:100] + "..."
+                text = f"**📋 Summary:** {summary}\n{text}"
         
         return text
     
     def _final_safety_check(self, text: str) -> str:
         """Final safety check for formatted text."""
         # Ensure text doesn't exceed Telegram limits
-        if len(text) > 4096:
-            text = text[:4090] + "..."
+        if len(text) > self.TELEGRAM_LIMIT:
+            text = text[:self._TRUNC_LENGTH] + self.TRUNC_SUFFIX
         
         # Check for balanced markdown
-        text = self._balance_markdown(text)
+        if '*' in text:
+            text = self._balance_markdown(text)
         
         return text
     
     def _balance_markdown(self, text: str) -> str:
         """Balance markdown formatting."""
-        # Count bold markers
-        bold_open = text.count('**')
-        if bold_open % 2 != 0:
-            # Remove unpaired bold markers
-            text = text.replace('**', '', 1)
+        if '*' not in text:
+            return text
         
-        # Count italic markers
-        italic_open = text.count('*')
-        if italic_open % 2 != 0:
-            # Remove unpaired italic markers
-            text = text.replace('*', '', 1)
+        # Stack of open markers from a single scan; '**' is consumed as one
+        # bold marker so it never skews the italic state. Each kind is open
+        # at most once, so a marker closes its open twin even when mis-nested
+        open_markers = []
+        for marker in self._RE_EMPHASIS_MARKER.findall(text):
+            if marker in open_markers:
+                open_markers.remove(marker)
+            else:
+                open_markers.append(marker)
+        
+        # Close any markers left open, innermost first
+        if open_markers:
+            text += ''.join(reversed(open_markers))
         
         return text
     
@@ -259,40 +311,28 @@ class MessageFormatter:
                            include_emoji: bool = True) -> str:
         """Format a news message specifically."""
         emoji = "📰" if include_emoji else ""
-        
-        formatted = f"{emoji} **{title}**\n\n"
-        formatted += f"{summary}\n\n"
-        formatted += f"🔗 *Source:* {source}"
-        
-        return formatted
+        return f"{emoji} **{title}**\n\n{summary}\n\n🔗 *Source:* {source}"
     
     def format_quiz_message(self, question: str, options: list, 
                            include_emoji: bool = True) -> str:
         """Format a quiz message."""
         emoji = "🧠" if include_emoji else ""
         
-        formatted = f"{emoji} **{question}**\n\n"
-        for i, option in enumerate(options):
-            formatted += f"{i+1}. {option}\n"
-        
-        return formatted
+        numbered_options = ''.join(f"{i}. {option}\n" for i, option in enumerate(options, 1))
+        return f"{emoji} **{question}**\n\n{numbered_options}"
     
     def format_debate_message(self, topic: str, speaker: str, 
                              message: str, include_emoji: bool = True) -> str:
         """Format a debate message."""
         emoji = "🎭" if include_emoji else ""
-        
-        formatted = f"{emoji} **{topic}**\n\n"
-        formatted += f"*{speaker}:* {message}"
-        
-        return formatted
+        return f"{emoji} **{topic}**\n\n*{speaker}:* {message}"
     
     async def health_check(self) -> Dict[str, Any]:
         """Health check for the message formatter."""
         try:
             # Test formatting with sample text
             test_text = "This is a **test** message with *formatting*."
-            formatted = await self.format_message(test_text, 'neutral', 'private', True)
+            formatted = self.format_message(test_text, 'neutral', 'private', True)
             
             return {
                 "status": "healthy",
@@ -7,6 +7,8 @@ This bot runs independently without FastAPI to avoid Python 3.13 compatibility i
 import asyncio
 import logging
 import os
+import signal
+from urllib.parse import urlparse
 from dotenv import load_dotenv
 from telegram import Bot
 from telegram.ext import Application, CommandHandler, MessageHandler, filters
@@ -26,6 +28,11 @@ if not TOKEN:
     print("❌ TELEGRAM_BOT_TOKEN not found in .env file")
     exit(1)
 
+# Webhook mode is used when a public URL is configured; polling otherwise
+WEBHOOK_URL = os.getenv('TELEGRAM_WEBHOOK_URL')
+WEBHOOK_SECRET = os.getenv('TELEGRAM_WEBHOOK_SECRET')
+WEBHOOK_PORT = int(os.getenv('PORT', '8443'))
+
 # Create bot and application
 bot = Bot(token=TOKEN)
 application = Application.builder().token(TOKEN).build()
@@ -154,17 +161,30 @@ async def main():
         
         print("✅ All handlers registered")
         
-        # Delete webhook
-        await bot.delete_webhook()
-        print("✅ Webhook deleted")
-        
-        # Start polling
-        print("🤖 Starting polling...")
         await application.initialize()
         await application.start()
-        await application.updater.start_polling()
         
-        print("✅ Bot polling started successfully!")
+        if WEBHOOK_URL:
+            # Telegram pushes updates to us; start_webhook also registers the URL
+            print("🌐 Starting webhook...")
+            await application.updater.start_webhook(
+                listen='0.0.0.0',
+                port=WEBHOOK_PORT,
+                url_path=urlparse(WEBHOOK_URL).path.lstrip('/'),
+                webhook_url=WEBHOOK_URL,
+                secret_token=WEBHOOK_SECRET
+            )
+            print(f"✅ Webhook listening on port {WEBHOOK_PORT}")
+        else:
+            # Delete webhook
+            await bot.delete_webhook()
+            print("✅ Webhook deleted")
+            
+            # Start polling
+            print("🤖 Starting polling...")
+            await application.updater.start_polling()
+            print("✅ Bot polling started successfully!")
+        
         print("📱 Bot is now listening and processing messages!")
         
         # Get bot info
@@ -174,14 +194,27 @@ async def main():
         print("💡 Send /start to your bot on Telegram - it will respond now!")
         print("🛑 Press Ctrl+C to stop")
         
-        # Keep the bot running
-        while True:
-            await asyncio.sleep(1)
+        # Keep the bot running until a stop signal arrives
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+        await stop_event.wait()
+        
+        print("\n🛑 Stopping bot...")
             
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Shut down cleanly even if startup failed part-way
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
+        print("✅ Bot stopped")
 
 if __name__ == "__main__":
     try:
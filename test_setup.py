@@ -6,8 +6,17 @@ Test script to verify Kroolo Agent Bot setup
 import os
 import sys
 import importlib
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
+def _try_import(module):
+    """Import a module, returning (name, error message or None)"""
+    try:
+        importlib.import_module(module)
+        return module, None
+    except ImportError as e:
+        return module, str(e)
+
 def test_imports():
     """Test if all required modules can be imported"""
     print("🔍 Testing module imports...")
@@ -25,12 +34,15 @@ def test_imports():
     
     failed_imports = []
     
-    for module in required_modules:
-        try:
-            importlib.import_module(module)
+    # Import concurrently so .pyc loads from disk overlap
+    with ThreadPoolExecutor(max_workers=len(required_modules)) as executor:
+        results = list(executor.map(_try_import, required_modules))
+    
+    for module, error in results:
+        if error is None:
             print(f"  ✅ {module}")
-        except ImportError as e:
-            print(f"  ❌ {module}: {e}")
+        else:
+            print(f"  ❌ {module}: {error}")
             failed_imports.append(module)
     
     if failed_imports:
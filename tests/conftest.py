@@ -1,214 +1,461 @@
-import pytest
+from __future__ import annotations
+
 import asyncio
-from typing import AsyncGenerator, Dict, Any
+import copy
+import os
+import shutil
+import pytest
+import pytest_asyncio
+from types import SimpleNamespace
+from typing import TYPE_CHECKING, AsyncGenerator, Dict, Any
 from unittest.mock import AsyncMock, MagicMock
-from fastapi.testclient import TestClient
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from hypothesis import settings
+
+try:
+    import uvloop
+    UVLOOP_AVAILABLE = True
+except ImportError:
+    UVLOOP_AVAILABLE = False
+
+# The app and service modules pull in the telegram/OpenAI/RAG stacks, so they
+# are imported inside the fixtures that need them rather than at collection
+if TYPE_CHECKING:
+    from fastapi.testclient import TestClient
+    from src.core.agent_manager import AgentManager
+    from src.core.telegram_client import TelegramClient
+    from src.core.rag_service import RAGService
+    from src.core.content_scheduler import ContentScheduler
+    from src.core.metrics_collector import MetricsCollector
+
+# Hypothesis profiles; failing examples replay from the .hypothesis database
+settings.register_profile("dev", max_examples=20)
+settings.register_profile("ci", max_examples=10)
+settings.load_profile(os.getenv("HYPOTHESIS_PROFILE", "dev"))
+
+def _make_stub(**attrs) -> SimpleNamespace:
+    """Build a plain attribute stub; much cheaper than MagicMock(spec=...)."""
+    return SimpleNamespace(**attrs)
+
+def _returning(value=None):
+    """Async method stub that returns a fixed value without call tracking.
+    
+    Tests that need to assert calls should swap in an AsyncMock with
+    monkeypatch.setattr(stub, name, AsyncMock(...)).
+    """
+    async def _method(*args, **kwargs):
+        return value
+    return _method
 
-from src.main import app
-from src.database.session import get_db_session
-from src.core.agent_manager import AgentManager
-from src.core.telegram_client import TelegramClient
-from src.core.rag_service import RAGService
-from src.core.content_scheduler import ContentScheduler
-from src.core.metrics_collector import MetricsCollector
+# Placeholder credentials so services construct without real keys
+TEST_ENV = {
+    "OPENAI_API_KEY": "test_key",
+    "GEMINI_API_KEY": "test_gemini_key"
+}
 
-# Test database URL
-TEST_DATABASE_URL = "sqlite+aiosqlite:///./test.db"
+@pytest.fixture(scope="session", autouse=True)
+def _test_env():
+    """Set placeholder API keys once for the session, keeping any real ones."""
+    with pytest.MonkeyPatch.context() as mp:
+        for key, value in TEST_ENV.items():
+            if key not in os.environ:
+                mp.setenv(key, value)
+        yield
+
+@pytest.fixture(scope="session")
+def _stub_ai_clients():
+    """Replace the OpenAI and Gemini client constructors for the session.
+    
+    Requested by the ai_service and command_handlers fixtures: those tests
+    only inspect AIService itself, so building real SDK clients (HTTP pools,
+    TLS contexts) is wasted work.
+    """
+    from services import ai_service as ai_service_module
+    
+    with pytest.MonkeyPatch.context() as mp:
+        if ai_service_module.OPENAI_AVAILABLE:
+            mp.setattr(ai_service_module.openai, "OpenAI", MagicMock)
+        if ai_service_module.GEMINI_AVAILABLE:
+            mp.setattr(ai_service_module.genai, "configure", MagicMock())
+            mp.setattr(ai_service_module.genai, "GenerativeModel", MagicMock)
+        yield
+
+@pytest.hookimpl(optionalhook=True)
+def pytest_asyncio_loop_factories(config, item):
+    """Run async tests on uvloop (installed with uvicorn[standard]) when available."""
+    if UVLOOP_AVAILABLE:
+        return {"uvloop": uvloop.new_event_loop}
+    return {"asyncio": asyncio.new_event_loop}
+
+# Test database URL: a named in-memory database per xdist worker. StaticPool
+# keeps the single connection, and with it the database, alive for the session
+TEST_DB_WORKER = os.environ.get("PYTEST_XDIST_WORKER", "master")
+TEST_DATABASE_URL = f"sqlite+aiosqlite:///file:kroolo_test_{TEST_DB_WORKER}?mode=memory&cache=shared&uri=true"
 
 # Create test engine
 test_engine = create_async_engine(
     TEST_DATABASE_URL,
     echo=False,
-    poolclass=None
+    poolclass=StaticPool,
+    connect_args={"check_same_thread": False}
 )
 
+# Let SQLAlchemy own BEGIN so SAVEPOINTs and outer rollbacks work with the
+# sqlite driver (which otherwise manages transactions itself)
+@event.listens_for(test_engine.sync_engine, "connect")
+def _disable_driver_transactions(dbapi_connection, connection_record):
+    dbapi_connection.isolation_level = None
+
+@event.listens_for(test_engine.sync_engine, "begin")
+def _emit_begin(conn):
+    conn.exec_driver_sql("BEGIN")
+
 TestingSessionLocal = sessionmaker(
     test_engine,
     class_=AsyncSession,
     expire_on_commit=False
 )
 
+@pytest_asyncio.fixture(scope="session")
+async def _create_schema():
+    """Create all tables once for the test session and drop them at the end."""
+    from src.models.base import Base
+    from src.models import agent, chat, content  # register tables on Base.metadata
+    
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield
+    async with test_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+    await test_engine.dispose()
+
+@pytest_asyncio.fixture
+async def db_session(_create_schema) -> AsyncGenerator[AsyncSession, None]:
+    """Create a test database session.
+    
+    The session runs inside an outer transaction that is rolled back after
+    the test, so commits made by the code under test only release SAVEPOINTs
+    and the schema never needs to be recreated.
+    """
+    async with test_engine.connect() as conn:
+        await conn.begin()
+        async with TestingSessionLocal(bind=conn, join_transaction_mode="create_savepoint") as session:
+            yield session
+        await conn.rollback()
+
 @pytest.fixture(scope="session")
-def event_loop():
-    """Create an instance of the default event loop for the test session."""
-    loop = asyncio.get_event_loop_policy().new_event_loop()
-    yield loop
-    loop.close()
+def client(override_dependencies) -> TestClient:
+    """Create a test client for the FastAPI app, shared by the whole session.
+    
+    Not entered as a context manager, so the app lifespan (database, real
+    Telegram client) never runs; the services come from override_dependencies.
+    """
+    from fastapi.testclient import TestClient
+    from src.main import app
+    
+    return TestClient(app)
 
-@pytest.fixture
-async def db_session() -> AsyncGenerator[AsyncSession, None]:
-    """Create a test database session."""
-    async with TestingSessionLocal() as session:
-        yield session
-        await session.rollback()
+# Legacy bot services (services/, handlers/, db.py), built once per session
+@pytest.fixture(scope="session")
+def ai_service(_stub_ai_clients):
+    """AIService instance shared by the session."""
+    from services.ai_service import AIService
+    return AIService()
+
+@pytest.fixture(scope="session")
+def database():
+    """In-memory SQLite Database instance shared by the session."""
+    from db import Database
+    # StaticPool keeps the one connection (and the schema) alive; no disk I/O
+    return Database("sqlite:///:memory:", engine_kwargs={"poolclass": StaticPool})
+
+@pytest.fixture(scope="session")
+def _db_template(tmp_path_factory):
+    """Directory holding an on-disk SQLite database with the schema created once."""
+    from db import Database
+    root = tmp_path_factory.mktemp("db_tpl")
+    Database(f"sqlite:///{root / 'kroolo_bot.db'}").engine.dispose()
+    return root
 
 @pytest.fixture
-def client() -> TestClient:
-    """Create a test client for the FastAPI app."""
-    return TestClient(app)
+def db_dir(tmp_path, _db_template):
+    """Private copy of the template database directory for tests needing a file DB."""
+    shutil.copytree(_db_template, tmp_path / "db", dirs_exist_ok=True)
+    return tmp_path / "db"
+
+@pytest.fixture(scope="session")
+def auth_service(database):
+    """AuthService instance shared by the session."""
+    from services.auth import AuthService
+    return AuthService(database)
+
+@pytest.fixture(scope="session")
+def command_handlers(_stub_ai_clients, ai_service, auth_service):
+    """CommandHandlers instance shared by the session."""
+    from handlers.commands import CommandHandlers
+    return CommandHandlers(ai_service, auth_service)
+
+_TELEGRAM_UPDATE = {
+    "update_id": 123456789,
+    "message": {
+        "message_id": 1,
+        "from": {
+            "id": 987654321,
+            "is_bot": False,
+            "first_name": "Test",
+            "username": "testuser"
+        },
+        "chat": {
+            "id": -100123456789,
+            "type": "group",
+            "title": "Test Group"
+        },
+        "date": 1640995200,
+        "text": "/start"
+    }
+}
 
 @pytest.fixture
 def mock_telegram_update() -> Dict[str, Any]:
-    """Mock Telegram update data."""
-    return {
-        "update_id": 123456789,
-        "message": {
-            "message_id": 1,
-            "from": {
-                "id": 987654321,
-                "is_bot": False,
-                "first_name": "Test",
-                "username": "testuser"
-            },
-            "chat": {
-                "id": -100123456789,
-                "type": "group",
-                "title": "Test Group"
-            },
-            "date": 1640995200,
-            "text": "/start"
-        }
-    }
+    """Mock Telegram update data; a fresh copy per test."""
+    return copy.deepcopy(_TELEGRAM_UPDATE)
+
+_AGENT_CONFIG = {
+    "name": "Test Agent",
+    "handle": "test_agent",
+    "persona": "A helpful test agent",
+    "capabilities": ["chat", "help"],
+    "guardrails": ["no_harm", "be_helpful"],
+    "rate_limits": {"messages_per_minute": 10},
+    "is_active": True,
+    "is_default": False
+}
 
 @pytest.fixture
 def mock_agent_config() -> Dict[str, Any]:
-    """Mock agent configuration."""
-    return {
+    """Mock agent configuration; a fresh copy per test."""
+    return copy.deepcopy(_AGENT_CONFIG)
+
+# Per-kind agent configurations shared by the agent test classes
+_AGENT_CONFIGS = {
+    "base": {
         "name": "Test Agent",
         "handle": "test_agent",
         "persona": "A helpful test agent",
         "capabilities": ["chat", "help"],
         "guardrails": ["no_harm", "be_helpful"],
         "rate_limits": {"messages_per_minute": 10},
-        "is_active": True,
-        "is_default": False
+        "is_active": True
+    },
+    "persona": {
+        "name": "Alan Turing",
+        "handle": "alanturing",
+        "persona": "A brilliant mathematician and computer scientist",
+        "capabilities": ["chat", "math", "computing"],
+        "guardrails": ["no_harm", "be_helpful", "academic"],
+        "openai_temperature": 0.7,
+        "openai_model": "gpt-4",
+        "max_tokens_per_response": 2000
+    },
+    "news": {
+        "name": "News Reporter",
+        "handle": "newsreporter",
+        "persona": "A professional news reporter",
+        "capabilities": ["news", "updates", "summaries"],
+        "rss_feeds": ["https://example.com/feed1", "https://example.com/feed2"],
+        "cache_duration": 1800
+    },
+    "quiz": {
+        "name": "Quiz Master",
+        "handle": "quizmaster",
+        "persona": "An engaging quiz master",
+        "capabilities": ["quiz", "questions", "scoring"],
+        "question_bank_size": 100,
+        "max_quiz_duration": 300
+    },
+    "debate": {
+        "name": "Debate Bot",
+        "handle": "debatebot",
+        "persona": "A skilled debate moderator",
+        "capabilities": ["debate", "moderation", "discussion"],
+        "debate_topics": ["AI Ethics", "Climate Change", "Education"],
+        "max_debate_duration": 1800
+    },
+    "fun": {
+        "name": "Fun Agent",
+        "handle": "funagent",
+        "persona": "An entertaining and fun-loving bot",
+        "capabilities": ["jokes", "facts", "riddles", "stories"],
+        "content_types": ["joke", "fact", "riddle", "story"],
+        "daily_usage_limit": 10
     }
+}
 
-@pytest.fixture
+@pytest.fixture(scope="session")
+def agent_config_factory():
+    """Factory returning a fresh config namespace for an agent kind."""
+    def make(kind: str) -> SimpleNamespace:
+        return SimpleNamespace(**copy.deepcopy(_AGENT_CONFIGS[kind]))
+    return make
+
+@pytest.fixture(scope="session")
 def mock_telegram_client() -> TelegramClient:
     """Mock Telegram client."""
-    client = MagicMock(spec=TelegramClient)
-    client.send_message = AsyncMock(return_value={"message_id": 1})
-    client.send_poll = AsyncMock(return_value={"poll_id": 1})
-    client.edit_message = AsyncMock(return_value=True)
-    client.delete_message = AsyncMock(return_value=True)
-    client.answer_callback_query = AsyncMock(return_value=True)
-    client.get_chat = AsyncMock(return_value={"id": 1, "type": "group"})
-    client.get_me = AsyncMock(return_value={"id": 123, "username": "test_bot"})
-    client.set_webhook = AsyncMock(return_value=True)
-    client.delete_webhook = AsyncMock(return_value=True)
-    client.health_check = AsyncMock(return_value={"status": "healthy"})
-    return client
+    return _make_stub(
+        send_message=_returning({"message_id": 1}),
+        send_poll=_returning({"poll_id": 1}),
+        edit_message=_returning(True),
+        delete_message=_returning(True),
+        answer_callback_query=_returning(True),
+        get_chat=_returning({"id": 1, "type": "group"}),
+        get_me=_returning({"id": 123, "username": "test_bot"}),
+        set_webhook=_returning(True),
+        delete_webhook=_returning(True),
+        health_check=_returning({"status": "healthy"})
+    )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_agent_manager() -> AgentManager:
     """Mock agent manager."""
-    manager = MagicMock(spec=AgentManager)
-    manager.get_agent = AsyncMock(return_value=MagicMock())
-    manager.get_agents_by_type = AsyncMock(return_value=[])
-    manager.get_agents_by_capability = AsyncMock(return_value=[])
-    manager.get_agents_by_tag = AsyncMock(return_value=[])
-    manager.reload_agents = AsyncMock(return_value=True)
-    manager.health_check = AsyncMock(return_value={"status": "healthy"})
-    return manager
+    return _make_stub(
+        get_agent=_returning(MagicMock()),
+        get_agents_by_type=_returning([]),
+        get_agents_by_capability=_returning([]),
+        get_agents_by_tag=_returning([]),
+        reload_agents=_returning(True),
+        health_check=_returning({"status": "healthy"})
+    )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_rag_service() -> RAGService:
     """Mock RAG service."""
-    service = MagicMock(spec=RAGService)
-    service.add_knowledge = AsyncMock(return_value="test_id")
-    service.search_knowledge = AsyncMock(return_value=[])
-    service.get_context_for_agent = AsyncMock(return_value="test context")
-    service.health_check = AsyncMock(return_value={"status": "healthy"})
-    return service
+    return _make_stub(
+        add_knowledge=_returning("test_id"),
+        search_knowledge=_returning([]),
+        get_context_for_agent=_returning("test context"),
+        health_check=_returning({"status": "healthy"})
+    )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_content_scheduler() -> ContentScheduler:
     """Mock content scheduler."""
-    scheduler = MagicMock(spec=ContentScheduler)
-    scheduler.schedule_content = AsyncMock(return_value="task_id")
-    scheduler.cancel_scheduled_content = AsyncMock(return_value=True)
-    scheduler.get_scheduled_content = AsyncMock(return_value=[])
-    scheduler.health_check = AsyncMock(return_value={"status": "healthy"})
-    return scheduler
+    return _make_stub(
+        schedule_content=_returning("task_id"),
+        cancel_scheduled_content=_returning(True),
+        get_scheduled_content=_returning([]),
+        health_check=_returning({"status": "healthy"})
+    )
 
-@pytest.fixture
+@pytest.fixture(scope="session")
 def mock_metrics_collector() -> MetricsCollector:
     """Mock metrics collector."""
-    collector = MagicMock(spec=MetricsCollector)
-    collector.record_message = AsyncMock()
-    collector.record_agent_response = AsyncMock()
-    collector.record_error = AsyncMock()
-    collector.get_metrics = AsyncMock(return_value={})
-    collector.health_check = AsyncMock(return_value={"status": "healthy"})
-    return collector
+    return _make_stub(
+        record_message=_returning(),
+        record_agent_response=_returning(),
+        record_error=_returning(),
+        get_metrics=_returning({}),
+        health_check=_returning({"status": "healthy"})
+    )
 
-@pytest.fixture
-async def override_dependencies(
+@pytest.fixture(scope="session")
+def mock_aiohttp_session() -> MagicMock:
+    """aiohttp.ClientSession stand-in whose context managers return prebuilt objects.
+    
+    Patch ClientSession with return_value=mock_aiohttp_session; session.get()
+    yields a 200 response with an empty body.
+    """
+    response = MagicMock(status=200)
+    response.text = AsyncMock(return_value="")
+    response.__aenter__.return_value = response
+    
+    session = MagicMock()
+    session.get.return_value = response
+    session.__aenter__.return_value = session
+    return session
+
+@pytest.fixture(scope="session")
+def override_dependencies(
     mock_telegram_client: TelegramClient,
     mock_agent_manager: AgentManager,
     mock_rag_service: RAGService,
     mock_content_scheduler: ContentScheduler,
     mock_metrics_collector: MetricsCollector
 ):
-    """Override dependencies for testing."""
+    """Override dependencies for testing.
+    
+    Installed once for the session by the client fixture. Tests needing a
+    different override should use monkeypatch.setitem(app.dependency_overrides,
+    ...), which reverts itself.
+    """
+    from src.main import app
+    from src.core.agent_manager import AgentManager
+    from src.core.telegram_client import TelegramClient
+    from src.core.rag_service import RAGService
+    from src.core.content_scheduler import ContentScheduler
+    from src.core.metrics_collector import MetricsCollector
+    
     app.dependency_overrides[TelegramClient] = lambda: mock_telegram_client
     app.dependency_overrides[AgentManager] = lambda: mock_agent_manager
     app.dependency_overrides[RAGService] = lambda: mock_rag_service
     app.dependency_overrides[ContentScheduler] = lambda: mock_content_scheduler
     app.dependency_overrides[MetricsCollector] = lambda: mock_metrics_collector
-    
-    yield
-    
-    app.dependency_overrides.clear()
+
+_NEWS_ARTICLE = {
+    "title": "Test News Article",
+    "summary": "This is a test news article for testing purposes.",
+    "source": "Test Source",
+    "url": "https://example.com/test",
+    "published_at": "2024-01-01T00:00:00Z",
+    "category": "technology",
+    "sentiment": "positive",
+    "embedding": [0.1, 0.2, 0.3]
+}
 
 @pytest.fixture
 def sample_news_article() -> Dict[str, Any]:
-    """Sample news article for testing."""
-    return {
-        "title": "Test News Article",
-        "summary": "This is a test news article for testing purposes.",
-        "source": "Test Source",
-        "url": "https://example.com/test",
-        "published_at": "2024-01-01T00:00:00Z",
-        "category": "technology",
-        "sentiment": "positive",
-        "embedding": [0.1, 0.2, 0.3]
-    }
+    """Sample news article for testing; a fresh copy per test."""
+    return copy.deepcopy(_NEWS_ARTICLE)
+
+_QUIZ = {
+    "question": "What is the capital of France?",
+    "options": ["London", "Berlin", "Paris", "Madrid"],
+    "correct_answer": 2,
+    "explanation": "Paris is the capital of France.",
+    "category": "geography",
+    "difficulty": "easy"
+}
 
 @pytest.fixture
 def sample_quiz() -> Dict[str, Any]:
-    """Sample quiz for testing."""
-    return {
-        "question": "What is the capital of France?",
-        "options": ["London", "Berlin", "Paris", "Madrid"],
-        "correct_answer": 2,
-        "explanation": "Paris is the capital of France.",
-        "category": "geography",
-        "difficulty": "easy"
-    }
+    """Sample quiz for testing; a fresh copy per test."""
+    return copy.deepcopy(_QUIZ)
+
+_DEBATE = {
+    "topic": "Should AI be regulated?",
+    "description": "A debate about AI regulation",
+    "participants": ["AlanTuring", "NewsReporter"],
+    "max_turns": 5,
+    "current_turn": 0,
+    "status": "active"
+}
 
 @pytest.fixture
 def sample_debate() -> Dict[str, Any]:
-    """Sample debate for testing."""
-    return {
-        "topic": "Should AI be regulated?",
-        "description": "A debate about AI regulation",
-        "participants": ["AlanTuring", "NewsReporter"],
-        "max_turns": 5,
-        "current_turn": 0,
-        "status": "active"
-    }
+    """Sample debate for testing; a fresh copy per test."""
+    return copy.deepcopy(_DEBATE)
+
+_FUN_CONTENT = {
+    "content_type": "joke",
+    "content": "Why don't scientists trust atoms? Because they make up everything!",
+    "category": "science",
+    "rating": 4.5,
+    "usage_count": 10
+}
 
 @pytest.fixture
 def sample_fun_content() -> Dict[str, Any]:
-    """Sample fun content for testing."""
-    return {
-        "content_type": "joke",
-        "content": "Why don't scientists trust atoms? Because they make up everything!",
-        "category": "science",
-        "rating": 4.5,
-        "usage_count": 10
-    }
+    """Sample fun content for testing; a fresh copy per test."""
+    return copy.deepcopy(_FUN_CONTENT)
@@ -9,21 +9,19 @@ from src.agents.quiz_agent import QuizAgent
 from src.agents.debate_agent import DebateAgent
 from src.agents.fun_agent import FunAgent
 
+@pytest.fixture(scope="module", autouse=True)
+def mock_openai():
+    """Patch the persona agent's openai module once for the whole module."""
+    with patch('src.agents.persona_agent.openai') as mock_openai:
+        yield mock_openai
+
 class TestBaseAgent:
     """Test base agent functionality."""
     
     @pytest.fixture
-    def mock_config(self):
+    def mock_config(self, agent_config_factory):
         """Mock agent configuration."""
-        return MagicMock(
-            name="Test Agent",
-            handle="test_agent",
-            persona="A helpful test agent",
-            capabilities=["chat", "help"],
-            guardrails=["no_harm", "be_helpful"],
-            rate_limits={"messages_per_minute": 10},
-            is_active=True
-        )
+        return agent_config_factory("base")
     
     @pytest.fixture
     def mock_telegram_client(self):
@@ -39,7 +37,6 @@ class TestBaseAgent:
         assert agent.agent_type == "base"
         assert agent.is_active == True
     
-    @pytest.mark.asyncio
     async def test_base_agent_process_message(self, mock_config, mock_telegram_client):
         """Test base agent message processing."""
         agent = BaseAgent(mock_config)
@@ -67,7 +64,6 @@ class TestBaseAgent:
             assert result["success"] == True
             assert "response" in result
     
-    @pytest.mark.asyncio
     async def test_base_agent_safety_checks(self, mock_config, mock_telegram_client):
         """Test base agent safety checks."""
         agent = BaseAgent(mock_config)
@@ -80,7 +76,6 @@ class TestBaseAgent:
         unsafe_message = "How to harm someone?"
         assert await agent._check_safety(unsafe_message) == False
     
-    @pytest.mark.asyncio
     async def test_base_agent_health_check(self, mock_config):
         """Test base agent health check."""
         agent = BaseAgent(mock_config)
@@ -93,110 +88,95 @@ class TestBaseAgent:
 class TestPersonaAgent:
     """Test persona agent functionality."""
     
-    @pytest.fixture
-    def mock_config(self):
+    @pytest.fixture(scope="class")
+    def mock_config(self, agent_config_factory):
         """Mock persona agent configuration."""
-        return MagicMock(
-            name="Alan Turing",
-            handle="alanturing",
-            persona="A brilliant mathematician and computer scientist",
-            capabilities=["chat", "math", "computing"],
-            guardrails=["no_harm", "be_helpful", "academic"],
-            openai_temperature=0.7,
-            openai_model="gpt-4",
-            max_tokens_per_response=2000
-        )
-    
-    @pytest.mark.asyncio
-    async def test_persona_agent_initialization(self, mock_config):
+        return agent_config_factory("persona")
+    
+    @pytest.fixture(scope="class")
+    def agent(self, mock_config, mock_openai):
+        """Persona agent shared by the tests in this class."""
+        return PersonaAgent(mock_config)
+    
+    async def test_persona_agent_initialization(self, agent, mock_config):
         """Test persona agent initialization."""
-        with patch('src.agents.persona_agent.openai') as mock_openai:
-            agent = PersonaAgent(mock_config)
-            
-            assert agent.config == mock_config
-            assert agent.agent_type == "persona"
-            assert agent.temperature == 0.7
-            assert agent.model == "gpt-4"
+        assert agent.config == mock_config
+        assert agent.agent_type == "persona"
+        assert agent.temperature == 0.7
+        assert agent.model == "gpt-4"
     
-    @pytest.mark.asyncio
-    async def test_persona_agent_response_generation(self, mock_config):
+    async def test_persona_agent_response_generation(self, agent, mock_openai):
         """Test persona agent response generation."""
-        with patch('src.agents.persona_agent.openai') as mock_openai:
-            agent = PersonaAgent(mock_config)
-            
-            message_info = {
-                "text": "What is the Turing Test?",
-                "user_id": 123,
-                "chat_id": 456
-            }
-            
-            agent_context = {
-                "user_history": [],
-                "chat_context": [],
-                "agent_memory": {}
-            }
-            
-            # Mock OpenAI response
-            mock_openai.ChatCompletion.acreate.return_value = {
-                "choices": [{"message": {"content": "The Turing Test is a method..."}}]
-            }
-            
-            response = await agent._generate_response(message_info, agent_context)
-            
-            assert "Turing Test" in response
-            assert mock_openai.ChatCompletion.acreate.called
+        mock_openai.reset_mock()
+        
+        message_info = {
+            "text": "What is the Turing Test?",
+            "user_id": 123,
+            "chat_id": 456
+        }
+        
+        agent_context = {
+            "user_history": [],
+            "chat_context": [],
+            "agent_memory": {}
+        }
+        
+        # Mock OpenAI response
+        mock_openai.ChatCompletion.acreate.return_value = {
+            "choices": [{"message": {"content": "The Turing Test is a method..."}}]
+        }
+        
+        response = await agent._generate_response(message_info, agent_context)
+        
+        assert "Turing Test" in response
+        assert mock_openai.ChatCompletion.acreate.called
     
-    @pytest.mark.asyncio
-    async def test_persona_agent_prompt_building(self, mock_config):
+    async def test_persona_agent_prompt_building(self, agent):
         """Test persona agent prompt building."""
-        with patch('src.agents.persona_agent.openai'):
-            agent = PersonaAgent(mock_config)
-            
-            user_message = "Tell me about computers"
-            agent_context = {
-                "user_history": ["Previous message"],
-                "chat_context": ["Chat context"],
-                "agent_memory": {"key": "value"}
-            }
-            
-            prompt = agent._build_prompt(user_message, agent_context)
-            
-            assert "Alan Turing" in prompt
-            assert "computers" in prompt
-            assert "Previous message" in prompt
+        user_message = "Tell me about computers"
+        agent_context = {
+            "user_history": ["Previous message"],
+            "chat_context": ["Chat context"],
+            "agent_memory": {"key": "value"}
+        }
+        
+        prompt = agent._build_prompt(user_message, agent_context)
+        
+        assert "Alan Turing" in prompt
+        assert "computers" in prompt
+        assert "Previous message" in prompt
 
 class TestNewsAgent:
     """Test news agent functionality."""
     
-    @pytest.fixture
-    def mock_config(self):
+    @pytest.fixture(scope="class")
+    def mock_config(self, agent_config_factory):
         """Mock news agent configuration."""
-        return MagicMock(
-            name="News Reporter",
-            handle="newsreporter",
-            persona="A professional news reporter",
-            capabilities=["news", "updates", "summaries"],
-            rss_feeds=["https://example.com/feed1", "https://example.com/feed2"],
-            cache_duration=1800
-        )
-    
-    @pytest.mark.asyncio
-    async def test_news_agent_initialization(self, mock_config):
+        return agent_config_factory("news")
+    
+    @pytest.fixture(scope="class")
+    def shared_agent(self, mock_config):
+        """News agent built once for the tests in this class."""
+        return NewsAgent(mock_config)
+    
+    @pytest.fixture
+    def agent(self, shared_agent):
+        """Shared news agent with its tracking state cleared after each test."""
+        yield shared_agent
+        shared_agent.news_cache.clear()
+        shared_agent.last_fetch_time = None
+    
+    async def test_news_agent_initialization(self, agent):
         """Test news agent initialization."""
-        agent = NewsAgent(mock_config)
-        
         assert agent.agent_type == "news"
         assert len(agent.rss_feeds) == 2
         assert agent.cache_duration.total_seconds() == 1800
     
-    @pytest.mark.asyncio
-    async def test_news_agent_fetch_news(self, mock_config):
+    async def test_news_agent_fetch_news(self, agent, mock_aiohttp_session):
         """Test news agent news fetching."""
-        with patch('src.agents.news_agent.aiohttp.ClientSession') as mock_session, \
+        with patch('src.agents.news_agent.aiohttp.ClientSession', return_value=mock_aiohttp_session), \
              patch('src.agents.news_agent.feedparser') as mock_feedparser:
             
-            agent = NewsAgent(mock_config)
-            
             # Mock RSS feed response
             mock_feedparser.parse.return_value = {
                 "entries": [
@@ -214,11 +194,8 @@ class TestNewsAgent:
             assert len(news) == 2  # 2 feeds
             assert "Test News" in [item["title"] for item in news[0]]
     
-    @pytest.mark.asyncio
-    async def test_news_agent_response_generation(self, mock_config):
+    async def test_news_agent_response_generation(self, agent):
         """Test news agent response generation."""
-        agent = NewsAgent(mock_config)
-        
         message_info = {
             "text": "Show me the latest news",
             "user_id": 123,
@@ -244,32 +221,31 @@ class TestNewsAgent:
 class TestQuizAgent:
     """Test quiz agent functionality."""
     
-    @pytest.fixture
-    def mock_config(self):
+    @pytest.fixture(scope="class")
+    def mock_config(self, agent_config_factory):
         """Mock quiz agent configuration."""
-        return MagicMock(
-            name="Quiz Master",
-            handle="quizmaster",
-            persona="An engaging quiz master",
-            capabilities=["quiz", "questions", "scoring"],
-            question_bank_size=100,
-            max_quiz_duration=300
-        )
-    
-    @pytest.mark.asyncio
-    async def test_quiz_agent_initialization(self, mock_config):
+        return agent_config_factory("quiz")
+    
+    @pytest.fixture(scope="class")
+    def shared_agent(self, mock_config):
+        """Quiz agent built once for the tests in this class."""
+        return QuizAgent(mock_config)
+    
+    @pytest.fixture
+    def agent(self, shared_agent):
+        """Shared quiz agent with its tracking state cleared after each test."""
+        yield shared_agent
+        shared_agent.active_quizzes.clear()
+        shared_agent.quiz_results.clear()
+    
+    async def test_quiz_agent_initialization(self, agent):
         """Test quiz agent initialization."""
-        agent = QuizAgent(mock_config)
-        
         assert agent.agent_type == "quiz"
         assert len(agent.question_bank) > 0
         assert len(agent.active_quizzes) == 0
     
-    @pytest.mark.asyncio
-    async def test_quiz_agent_start_quiz(self, mock_config):
+    async def test_quiz_agent_start_quiz(self, agent):
         """Test quiz agent starting a new quiz."""
-        agent = QuizAgent(mock_config)
-        
         chat_id = 123
         user_id = 456
         
@@ -279,11 +255,8 @@ class TestQuizAgent:
         assert chat_id in agent.active_quizzes
         assert agent.active_quizzes[chat_id]["user_id"] == user_id
     
-    @pytest.mark.asyncio
-    async def test_quiz_agent_process_answer(self, mock_config):
+    async def test_quiz_agent_process_answer(self, agent):
         """Test quiz agent processing answers."""
-        agent = QuizAgent(mock_config)
-        
         # Start a quiz first
         chat_id = 123
         user_id = 456
@@ -297,32 +270,31 @@ class TestQuizAgent:
 class TestDebateAgent:
     """Test debate agent functionality."""
     
-    @pytest.fixture
-    def mock_config(self):
+    @pytest.fixture(scope="class")
+    def mock_config(self, agent_config_factory):
         """Mock debate agent configuration."""
-        return MagicMock(
-            name="Debate Bot",
-            handle="debatebot",
-            persona="A skilled debate moderator",
-            capabilities=["debate", "moderation", "discussion"],
-            debate_topics=["AI Ethics", "Climate Change", "Education"],
-            max_debate_duration=1800
-        )
-    
-    @pytest.mark.asyncio
-    async def test_debate_agent_initialization(self, mock_config):
+        return agent_config_factory("debate")
+    
+    @pytest.fixture(scope="class")
+    def shared_agent(self, mock_config):
+        """Debate agent built once for the tests in this class."""
+        return DebateAgent(mock_config)
+    
+    @pytest.fixture
+    def agent(self, shared_agent):
+        """Shared debate agent with its tracking state cleared after each test."""
+        yield shared_agent
+        shared_agent.active_debates.clear()
+        shared_agent.debate_history.clear()
+    
+    async def test_debate_agent_initialization(self, agent):
         """Test debate agent initialization."""
-        agent = DebateAgent(mock_config)
-        
         assert agent.agent_type == "debate"
         assert len(agent.debate_topics) == 3
         assert len(agent.active_debates) == 0
     
-    @pytest.mark.asyncio
-    async def test_debate_agent_start_debate(self, mock_config):
+    async def test_debate_agent_start_debate(self, agent):
         """Test debate agent starting a new debate."""
-        agent = DebateAgent(mock_config)
-        
         chat_id = 123
         user_id = 456
         
@@ -332,11 +304,8 @@ class TestDebateAgent:
         assert chat_id in agent.active_debates
         assert agent.active_debates[chat_id]["status"] == "active"
     
-    @pytest.mark.asyncio
-    async def test_debate_agent_run_debate(self, mock_config):
+    async def test_debate_agent_run_debate(self, agent):
         """Test debate agent running a debate."""
-        agent = DebateAgent(mock_config)
-        
         # Start a debate first
         chat_id = 123
         user_id = 456
@@ -352,32 +321,32 @@ class TestDebateAgent:
 class TestFunAgent:
     """Test fun agent functionality."""
     
-    @pytest.fixture
-    def mock_config(self):
+    @pytest.fixture(scope="class")
+    def mock_config(self, agent_config_factory):
         """Mock fun agent configuration."""
-        return MagicMock(
-            name="Fun Agent",
-            handle="funagent",
-            persona="An entertaining and fun-loving bot",
-            capabilities=["jokes", "facts", "riddles", "stories"],
-            content_types=["joke", "fact", "riddle", "story"],
-            daily_usage_limit=10
-        )
-    
-    @pytest.mark.asyncio
-    async def test_fun_agent_initialization(self, mock_config):
+        return agent_config_factory("fun")
+    
+    @pytest.fixture(scope="class")
+    def shared_agent(self, mock_config):
+        """Fun agent built once for the tests in this class."""
+        return FunAgent(mock_config)
+    
+    @pytest.fixture
+    def agent(self, shared_agent):
+        """Shared fun agent with its tracking state cleared after each test."""
+        yield shared_agent
+        shared_agent.daily_usage.clear()
+        shared_agent.last_usage.clear()
+        shared_agent.user_ratings.clear()
+    
+    async def test_fun_agent_initialization(self, agent):
         """Test fun agent initialization."""
-        agent = FunAgent(mock_config)
-        
         assert agent.agent_type == "fun"
         assert len(agent.content_types) == 4
         assert len(agent.content_database) > 0
     
-    @pytest.mark.asyncio
-    async def test_fun_agent_content_generation(self, mock_config):
+    async def test_fun_agent_content_generation(self, agent):
         """Test fun agent content generation."""
-        agent = FunAgent(mock_config)
-        
         message_info = {
             "text": "Tell me a joke",
             "user_id": 123,
@@ -394,11 +363,8 @@ class TestFunAgent:
         
         assert "joke" in response.lower() or "funny" in response.lower()
     
-    @pytest.mark.asyncio
-    async def test_fun_agent_rate_limiting(self, mock_config):
+    async def test_fun_agent_rate_limiting(self, agent):
         """Test fun agent rate limiting."""
-        agent = FunAgent(mock_config)
-        
         chat_id = 123
         
         # Should be able to use content initially
@@ -411,44 +377,40 @@ class TestFunAgent:
         # Should be rate limited
         assert await agent._can_use_content(chat_id) == False
 
+@pytest.mark.skip(reason="placeholder: not implemented yet")
 class TestAgentIntegration:
     """Test agent integration and interaction."""
     
-    @pytest.mark.asyncio
     async def test_agent_chain_processing(self):
         """Test multiple agents working together."""
         # This would test how agents can work together
         # For example, news agent providing context to persona agent
         pass
     
-    @pytest.mark.asyncio
     async def test_agent_context_sharing(self):
         """Test agents sharing context and memory."""
         # This would test context sharing between agents
         pass
     
-    @pytest.mark.asyncio
     async def test_agent_fallback_mechanism(self):
         """Test agent fallback when primary agent fails."""
         # This would test fallback mechanisms
         pass
 
+@pytest.mark.skip(reason="placeholder: not implemented yet")
 class TestAgentPerformance:
     """Test agent performance characteristics."""
     
-    @pytest.mark.asyncio
     async def test_agent_response_time(self):
         """Test agent response time performance."""
         # This would test response time performance
         pass
     
-    @pytest.mark.asyncio
     async def test_agent_memory_usage(self):
         """Test agent memory usage."""
         # This would test memory usage
         pass
     
-    @pytest.mark.asyncio
     async def test_agent_concurrent_processing(self):
         """Test agent concurrent processing capability."""
         # This would test concurrent processing
@@ -0,0 +1,176 @@
+"""
+Tests for the Redis cache utilities in utils/cache.py.
+Redis is replaced by an in-memory fake sharing the test's clock.
+"""
+
+import array
+import fnmatch
+import pytest
+
+from utils import cache as cache_module
+from utils.cache import RedisCache, CacheManager, RateLimiter
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the redis-py client calls the cache makes."""
+    
+    def __init__(self, clock):
+        self.clock = clock
+        self.data = {}  # key -> (value, expires_at or None)
+    
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry is not None and entry[1] is not None and entry[1] <= self.clock.now:
+            del self.data[key]
+            return None
+        return entry
+    
+    def get(self, key):
+        entry = self._live(key)
+        return entry[0] if entry else None
+    
+    def mget(self, keys):
+        return [self.get(key) for key in keys]
+    
+    def setex(self, key, seconds, value):
+        self.data[key] = (value, self.clock.now + seconds)
+    
+    def pttl(self, key):
+        entry = self._live(key)
+        if entry is None:
+            return -2
+        if entry[1] is None:
+            return -1
+        return int((entry[1] - self.clock.now) * 1000)
+    
+    def delete(self, key):
+        self.data.pop(key, None)
+    
+    unlink = delete
+    
+    def scan_iter(self, match, count=None):
+        return [key for key in list(self.data) if fnmatch.fnmatchcase(key, match)]
+    
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Queue calls on FakeRedis and run them on execute()."""
+    
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+    
+    def __getattr__(self, name):
+        def queue(*args):
+            self.calls.append((getattr(self.client, name), args))
+        return queue
+    
+    def execute(self):
+        calls, self.calls = self.calls, []
+        return [method(*args) for method, args in calls]
+
+
+class FakeClock:
+    """Controllable stand-in for time.monotonic."""
+    
+    def __init__(self, now: float = 1_000.0):
+        self.now = now
+    
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Freeze the cache clock; tests move it with advance()."""
+    clock = FakeClock()
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: clock.now)
+    return clock
+
+
+@pytest.fixture
+def redis_cache(monkeypatch, fake_clock):
+    """RedisCache backed by FakeRedis instead of a server."""
+    monkeypatch.setattr(RedisCache, "_init_redis", lambda self: None)
+    redis_cache = RedisCache("redis://test")
+    redis_cache.redis_client = FakeRedis(fake_clock)
+    return redis_cache
+
+
+@pytest.fixture
+def cache_manager(redis_cache):
+    """CacheManager in front of the fake Redis."""
+    return CacheManager(redis_cache)
+
+
+class TestAIResponseCache:
+    """Test the process-local LRU in front of the Redis AI response cache."""
+    
+    def test_short_ttl_entry_not_served_after_expiry(self, cache_manager, redis_cache, fake_clock):
+        """Test an entry read from Redis expires locally with its Redis TTL."""
+        # Written by another process with a short TTL
+        redis_cache.set("ai_response:abc", "answer", expire=5)
+        
+        assert cache_manager.get_cached_ai_response("abc") == "answer"
+        
+        fake_clock.advance(6)
+        assert cache_manager.get_cached_ai_response("abc") is None
+    
+    def test_local_copy_capped_at_l1_ttl(self, cache_manager, fake_clock):
+        """Test a long-lived response is re-read from Redis after the L1 cap."""
+        cache_manager.cache_ai_response("abc", "answer", ttl=7200)
+        cache_manager.cache.redis_client.setex("ai_response:abc", 7200, '"replaced"')
+        
+        assert cache_manager.get_cached_ai_response("abc") == "answer"
+        
+        fake_clock.advance(CacheManager.AI_RESPONSE_L1_TTL + 1)
+        assert cache_manager.get_cached_ai_response("abc") == "replaced"
+    
+    def test_delete_drops_local_copy(self, cache_manager, redis_cache):
+        """Test deleting the Redis key also drops the local copy."""
+        cache_manager.cache_ai_response("abc", "answer")
+        
+        redis_cache.delete("ai_response:abc")
+        assert cache_manager.get_cached_ai_response("abc") is None
+    
+    def test_delete_pattern_drops_local_copies(self, cache_manager, redis_cache):
+        """Test a pattern delete drops the local copies of the matched keys."""
+        cache_manager.cache_ai_response("abc", "answer")
+        cache_manager.cache_ai_response("def", "other")
+        
+        redis_cache.delete_pattern("ai_response:*")
+        assert cache_manager.get_cached_ai_response("abc") is None
+        assert cache_manager.get_cached_ai_response("def") is None
+
+
+class TestRateLimiter:
+    """Test the Redis-backed rate limiter keys."""
+    
+    @pytest.mark.parametrize("user_id,chat_id", [(123, -100), ("123", "-100")])
+    def test_rate_limit_info_accepts_int_and_str_ids(self, redis_cache, user_id, chat_id):
+        """Test rate limit keys are built for both int and string IDs."""
+        info = RateLimiter(redis_cache).get_rate_limit_info(user_id, chat_id)
+        
+        assert info["user"]["remaining"] == info["user"]["limit"]
+        assert info["chat"]["remaining"] == info["chat"]["limit"]
+
+
+class TestPackedValues:
+    """Test the msgpack round trip used by set_packed/get_packed."""
+    
+    @pytest.mark.parametrize("value", [
+        {"ids": {1, 2, 3}},
+        {(1, 2)},
+        frozenset({("a", 1)}),
+        {"scores": array.array("d", [1.5, 2.5])},
+    ])
+    def test_round_trip(self, value):
+        """Test a value survives _serialize/_deserialize unchanged."""
+        pytest.importorskip("msgpack")
+        assert RedisCache._deserialize(RedisCache._serialize(value)) == value
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
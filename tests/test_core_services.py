@@ -1,6 +1,12 @@
+import array
+import asyncio
 import pytest
+import pytest_asyncio
+import string
 import time
-from unittest.mock import AsyncMock, MagicMock, patch
+from hypothesis import given, strategies as st
+from unittest.mock import AsyncMock, MagicMock
+from types import SimpleNamespace
 from typing import Dict, Any
 
 from src.core.rate_limiter import RateLimiter, RateLimitConfig, TokenBucket
@@ -8,16 +14,32 @@ from src.core.security import SecurityManager, sanitize_input, validate_telegram
 from src.core.intent_classifier import IntentClassifier, Intent
 from src.core.rag_service import RAGService
 
+class FakeClock:
+    """Controllable stand-in for the rate limiter's time source."""
+    
+    def __init__(self, now: float = 1_000_000.0):
+        self.now = now
+    
+    def advance(self, seconds: float):
+        self.now += seconds
+
+@pytest.fixture
+def fake_clock(monkeypatch):
+    """Freeze the rate limiter clock; tests move it with advance()."""
+    clock = FakeClock()
+    monkeypatch.setattr('src.core.rate_limiter.time.time', lambda: clock.now)
+    return clock
+
 class TestRateLimiter:
     """Test rate limiter functionality."""
     
     @pytest.fixture
-    def rate_limiter(self):
+    def rate_limiter(self, fake_clock):
         """Create a rate limiter instance."""
         return RateLimiter()
     
     @pytest.fixture
-    def token_bucket(self):
+    def token_bucket(self, fake_clock):
         """Create a token bucket instance."""
         config = RateLimitConfig(
             tokens_per_second=1.0,
@@ -46,19 +68,19 @@ class TestRateLimiter:
         assert token_bucket.consume(5) == False
         assert token_bucket.tokens == 2
     
-    def test_token_bucket_refill(self, token_bucket):
+    def test_token_bucket_refill(self, token_bucket, fake_clock):
         """Test token bucket refill."""
         # Consume all tokens
         token_bucket.consume(10)
         assert token_bucket.tokens == 0
         
-        # Wait for refill
-        time.sleep(1.1)
+        # Advance the clock instead of sleeping; consume(0) triggers the refill
+        fake_clock.advance(1.1)
+        assert token_bucket.consume(0) == True
         
         # Should have refilled
         assert token_bucket.tokens > 0
     
-    @pytest.mark.asyncio
     async def test_rate_limiter_initialization(self, rate_limiter):
         """Test rate limiter initialization."""
         await rate_limiter.initialize()
@@ -68,7 +90,6 @@ class TestRateLimiter:
         assert "chat" in rate_limiter.chat_buckets
         assert "global" in rate_limiter.global_buckets
     
-    @pytest.mark.asyncio
     async def test_rate_limiter_check_rate_limit(self, rate_limiter):
         """Test rate limit checking."""
         await rate_limiter.initialize()
@@ -89,7 +110,32 @@ class TestRateLimiter:
         # Should be rate limited now
         assert await rate_limiter.check_rate_limit(message_info) == False
     
-    @pytest.mark.asyncio
+    async def test_rate_limiter_check_rate_limit_batch(self, rate_limiter):
+        """Test batched rate limit checking."""
+        await rate_limiter.initialize()
+        
+        message_infos = [{"user_id": 123, "chat_id": 456}] * 20
+        bucket_size = rate_limiter.user_config.bucket_size
+        
+        results = await rate_limiter.check_rate_limit_batch(message_infos)
+        
+        # The user bucket admits its capacity, then limits the rest
+        assert results == [True] * bucket_size + [False] * (20 - bucket_size)
+    
+    async def test_rate_limiter_check_rate_limit_batch_unidentified(self, rate_limiter):
+        """Test batched messages missing user_id or chat_id are allowed without using tokens."""
+        await rate_limiter.initialize()
+        
+        unidentified = [{"user_id": 123}, {"chat_id": 456}, {}, {"user_id": None, "chat_id": 456}]
+        bucket_size = rate_limiter.user_config.bucket_size
+        message_infos = unidentified + [{"user_id": 123, "chat_id": 456}] * (bucket_size + 1) + unidentified
+        
+        results = await rate_limiter.check_rate_limit_batch(message_infos)
+        
+        # Unidentified messages pass and leave the user bucket to the identified ones
+        skipped = [True] * len(unidentified)
+        assert results == skipped + [True] * bucket_size + [False] + skipped
+    
     async def test_rate_limiter_health_check(self, rate_limiter):
         """Test rate limiter health check."""
         await rate_limiter.initialize()
@@ -104,11 +150,17 @@ class TestRateLimiter:
 class TestSecurityManager:
     """Test security manager functionality."""
     
-    @pytest.fixture
-    def security_manager(self):
-        """Create a security manager instance."""
+    @pytest.fixture(scope="session")
+    def shared_security_manager(self):
+        """Create a security manager instance, shared by the session."""
         return SecurityManager()
     
+    @pytest.fixture
+    def security_manager(self, shared_security_manager):
+        """Shared security manager, with its tracking state cleared after each test."""
+        yield shared_security_manager
+        shared_security_manager.reset()
+    
     def test_security_manager_initialization(self, security_manager):
         """Test security manager initialization."""
         assert len(security_manager.blocked_ips) == 0
@@ -148,7 +200,6 @@ class TestSecurityManager:
         assert security_manager.rate_limit_violations[ip]["type"] == violation_type
         assert "count" in security_manager.rate_limit_violations[ip]
     
-    @pytest.mark.asyncio
     async def test_security_manager_health_check(self, security_manager):
         """Test security manager health check."""
         health = await security_manager.health_check()
@@ -199,12 +250,24 @@ class TestSecurityFunctions:
         assert validate_telegram_id(0) == False
         assert validate_telegram_id(None) == False
 
+# Command prefixes and the intent each routes to
+COMMAND_INTENTS = {
+    "/news": Intent.NEWS,
+    "/quiz": Intent.QUIZ,
+    "/debate": Intent.DEBATE,
+    "/fun": Intent.FUN,
+    "/help": Intent.HELP,
+    "/config": Intent.ADMIN,
+    "/agents": Intent.HELP,
+    "/rules": Intent.HELP
+}
+
 class TestIntentClassifier:
     """Test intent classifier functionality."""
     
-    @pytest.fixture
+    @pytest.fixture(scope="session")
     def intent_classifier(self):
-        """Create an intent classifier instance."""
+        """Create an intent classifier instance, shared by the session."""
         return IntentClassifier()
     
     def test_intent_classifier_initialization(self, intent_classifier):
@@ -213,53 +276,29 @@ class TestIntentClassifier:
         assert len(intent_classifier.keyword_weights) > 0
         assert len(intent_classifier.context_patterns) > 0
     
-    @pytest.mark.asyncio
-    async def test_news_intent_classification(self, intent_classifier):
-        """Test news intent classification."""
-        text = "Show me the latest news"
-        intent = await intent_classifier.classify_intent(text)
-        
-        assert intent == Intent.NEWS
-    
-    @pytest.mark.asyncio
-    async def test_quiz_intent_classification(self, intent_classifier):
-        """Test quiz intent classification."""
-        text = "I want to take a quiz"
-        intent = await intent_classifier.classify_intent(text)
-        
-        assert intent == Intent.QUIZ
-    
-    @pytest.mark.asyncio
-    async def test_debate_intent_classification(self, intent_classifier):
-        """Test debate intent classification."""
-        text = "Let's have a debate about AI"
-        intent = await intent_classifier.classify_intent(text)
-        
-        assert intent == Intent.DEBATE
-    
-    @pytest.mark.asyncio
-    async def test_fun_intent_classification(self, intent_classifier):
-        """Test fun intent classification."""
-        text = "Tell me a joke"
+    @pytest.mark.parametrize("text,expected", [
+        ("Show me the latest news", Intent.NEWS),
+        ("I want to take a quiz", Intent.QUIZ),
+        ("Let's have a debate about AI", Intent.DEBATE),
+        ("Tell me a joke", Intent.FUN),
+        ("Help me understand how to use this bot", Intent.HELP),
+        ("Random text without clear intent", Intent.UNKNOWN),
+    ])
+    async def test_intent_classification(self, intent_classifier, text, expected):
+        """Test intent classification for each intent."""
         intent = await intent_classifier.classify_intent(text)
         
-        assert intent == Intent.FUN
+        assert intent == expected
     
-    @pytest.mark.asyncio
-    async def test_help_intent_classification(self, intent_classifier):
-        """Test help intent classification."""
-        text = "Help me understand how to use this bot"
-        intent = await intent_classifier.classify_intent(text)
+    @given(
+        command=st.sampled_from(sorted(COMMAND_INTENTS)),
+        args=st.text(alphabet=string.ascii_letters + " ", max_size=30)
+    )
+    async def test_command_intent_classification(self, intent_classifier, command, args):
+        """Test that commands route to their intent whatever arguments follow."""
+        intent = await intent_classifier.classify_intent(f"{command} {args}")
         
-        assert intent == Intent.HELP
-    
-    @pytest.mark.asyncio
-    async def test_unknown_intent_classification(self, intent_classifier):
-        """Test unknown intent classification."""
-        text = "Random text without clear intent"
-        intent = await intent_classifier.classify_intent(text)
-        
-        assert intent == Intent.UNKNOWN
+        assert intent == COMMAND_INTENTS[command]
     
     def test_rule_based_scoring(self, intent_classifier):
         """Test rule-based scoring."""
@@ -270,7 +309,6 @@ class TestIntentClassifier:
         assert Intent.NEWS in scores
         assert scores[Intent.NEWS] > 0
     
-    @pytest.mark.asyncio
     async def test_intent_classifier_health_check(self, intent_classifier):
         """Test intent classifier health check."""
         health = await intent_classifier.health_check()
@@ -279,170 +317,171 @@ class TestIntentClassifier:
         assert "patterns_compiled" in health
         assert "total_classifications" in health
 
+EMBEDDING_DIM = 384
+
+def _fake_encode(texts, **kwargs):
+    """Zero embeddings shaped like SentenceTransformer.encode output."""
+    if isinstance(texts, list):
+        return [array.array('f', bytes(4 * EMBEDDING_DIM)) for _ in texts]
+    return array.array('f', bytes(4 * EMBEDDING_DIM))
+
+@pytest.fixture(scope="module", autouse=True)
+def fake_vector_backend():
+    """Stub the embedding model and Qdrant client: no model load, no network."""
+    embedder = MagicMock(encode=_fake_encode)
+    embedder.get_sentence_embedding_dimension.return_value = EMBEDDING_DIM
+    
+    qdrant = MagicMock()
+    qdrant.get_collections.return_value = SimpleNamespace(
+        collections=[SimpleNamespace(name="kroolo_knowledge")]
+    )
+    qdrant.search.return_value = []
+    qdrant.upsert.return_value = None
+    
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr('src.core.rag_service.SentenceTransformer', lambda *args, **kwargs: embedder, raising=False)
+        mp.setattr('src.core.rag_service.QdrantClient', lambda *args, **kwargs: qdrant, raising=False)
+        mp.setattr('src.core.rag_service.PointStruct', SimpleNamespace, raising=False)
+        yield
+
 class TestRAGService:
     """Test RAG service functionality."""
     
     @pytest.fixture
     def rag_service(self):
-        """Create a RAG service instance."""
+        """Create an uninitialized RAG service instance."""
         return RAGService()
     
-    @pytest.mark.asyncio
-    async def test_rag_service_initialization(self, rag_service):
+    @pytest_asyncio.fixture(scope="module")
+    async def initialized_rag(self, fake_vector_backend):
+        """RAG service initialized once with Qdrant available, shared by the module."""
+        service = RAGService()
+        with pytest.MonkeyPatch.context() as mp:
+            mp.setattr('src.core.rag_service.QDRANT_AVAILABLE', True)
+            await service.initialize()
+        yield service
+    
+    async def test_rag_service_initialization(self, initialized_rag):
         """Test RAG service initialization."""
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', True):
-            await rag_service.initialize()
-            
-            assert rag_service.is_initialized == True
-            assert rag_service.client is not None
-    
-    @pytest.mark.asyncio
-    async def test_add_knowledge(self, rag_service):
+        assert initialized_rag.is_initialized == True
+        assert initialized_rag.client is not None
+    
+    async def test_add_knowledge(self, initialized_rag):
         """Test adding knowledge to RAG service."""
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', True):
-            await rag_service.initialize()
-            
-            content = "This is a test knowledge item"
-            metadata = {"type": "test", "source": "test"}
-            
-            knowledge_id = await rag_service.add_knowledge(content, metadata)
-            
-            assert knowledge_id is not None
-            assert isinstance(knowledge_id, str)
-    
-    @pytest.mark.asyncio
-    async def test_search_knowledge(self, rag_service):
+        content = "This is a test knowledge item"
+        metadata = {"type": "test", "source": "test"}
+        
+        knowledge_id = await initialized_rag.add_knowledge(content, metadata)
+        
+        assert knowledge_id is not None
+        assert isinstance(knowledge_id, str)
+    
+    async def test_search_knowledge(self, initialized_rag):
         """Test searching knowledge in RAG service."""
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', True):
-            await rag_service.initialize()
-            
-            query = "test knowledge"
-            results = await rag_service.search_knowledge(query, limit=5)
-            
-            assert isinstance(results, list)
-            assert len(results) <= 5
-    
-    @pytest.mark.asyncio
-    async def test_get_context_for_agent(self, rag_service):
+        query = "test knowledge"
+        results = await initialized_rag.search_knowledge(query, limit=5)
+        
+        assert isinstance(results, list)
+        assert len(results) <= 5
+    
+    async def test_get_context_for_agent(self, initialized_rag):
         """Test getting context for agent."""
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', True):
-            await rag_service.initialize()
-            
-            query = "test query"
-            agent_context = {"agent_type": "persona", "capabilities": ["chat"]}
-            
-            context = await rag_service.get_context_for_agent(query, agent_context)
-            
-            assert isinstance(context, str)
-            assert len(context) > 0
-    
-    @pytest.mark.asyncio
-    async def test_rag_service_health_check(self, rag_service):
+        query = "test query"
+        agent_context = {"agent_type": "persona", "capabilities": ["chat"]}
+        
+        context = await initialized_rag.get_context_for_agent(query, agent_context)
+        
+        assert isinstance(context, str)
+        assert len(context) > 0
+    
+    async def test_rag_service_health_check(self, initialized_rag):
         """Test RAG service health check."""
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', True):
-            await rag_service.initialize()
-            
-            health = await rag_service.health_check()
-            
-            assert health["status"] == "healthy"
-            assert "qdrant_status" in health
-            assert "embedding_model_status" in health
-    
-    @pytest.mark.asyncio
-    async def test_rag_service_without_qdrant(self, rag_service):
+        health = await initialized_rag.health_check()
+        
+        assert health["status"] == "healthy"
+        assert "qdrant_status" in health
+        assert "embedding_model_status" in health
+    
+    async def test_rag_service_without_qdrant(self, rag_service, monkeypatch):
         """Test RAG service without Qdrant available."""
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', False):
-            await rag_service.initialize()
-            
-            # Should still initialize but with limited functionality
-            assert rag_service.is_initialized == True
-            assert rag_service.client is None
+        monkeypatch.setattr('src.core.rag_service.QDRANT_AVAILABLE', False)
+        await rag_service.initialize()
+        
+        # Should still initialize but with limited functionality
+        assert rag_service.is_initialized == True
+        assert rag_service.client is None
 
 class TestIntegration:
     """Test integration between core services."""
     
-    @pytest.mark.asyncio
-    async def test_rate_limiter_with_security(self):
-        """Test rate limiter integration with security manager."""
-        rate_limiter = RateLimiter()
+    def test_rate_limiter_with_security(self):
+        """Test security manager tracking of rate limit violations."""
         security_manager = SecurityManager()
         
-        await rate_limiter.initialize()
-        
-        # Simulate rate limit violations
-        message_info = {"user_id": 123, "chat_id": 456}
+        # RateLimiter does not report to SecurityManager, so record directly
+        security_manager.record_rate_limit_violation(123, 456, "message_spam")
         
-        for _ in range(25):  # Exceed rate limit
-            await rate_limiter.check_rate_limit(message_info)
-        
-        # Security manager should track violations
-        assert len(security_manager.rate_limit_violations) > 0
+        assert security_manager.rate_limit_violations["123:456"]["message_spam"] == 1
     
-    @pytest.mark.asyncio
-    async def test_intent_classifier_with_rag(self):
+    async def test_intent_classifier_with_rag(self, monkeypatch):
         """Test intent classifier integration with RAG service."""
         intent_classifier = IntentClassifier()
         rag_service = RAGService()
         
-        with patch('src.core.rag_service.QDRANT_AVAILABLE', True):
-            await rag_service.initialize()
-            
-            # Classify intent
-            text = "What's the latest news about AI?"
-            intent = await intent_classifier.classify_intent(text)
-            
-            # Get context from RAG
-            agent_context = {"agent_type": "news", "capabilities": ["news"]}
-            context = await rag_service.get_context_for_agent(text, agent_context)
-            
-            assert intent == Intent.NEWS
-            assert isinstance(context, str)
+        monkeypatch.setattr('src.core.rag_service.QDRANT_AVAILABLE', True)
+        await rag_service.initialize()
+        
+        # Classify intent
+        text = "What's the latest news about AI?"
+        intent = await intent_classifier.classify_intent(text)
+        
+        # Get context from RAG
+        agent_context = {"agent_type": "news", "capabilities": ["news"]}
+        context = await rag_service.get_context_for_agent(text, agent_context)
+        
+        assert intent == Intent.NEWS
+        assert isinstance(context, str)
 
 class TestPerformance:
     """Test performance characteristics of core services."""
     
-    @pytest.mark.asyncio
-    async def test_rate_limiter_performance(self):
-        """Test rate limiter performance."""
+    async def test_rate_limiter_performance(self, fake_clock):
+        """Test rate limiter throughput per clock tick."""
         rate_limiter = RateLimiter()
         await rate_limiter.initialize()
         
-        import time
-        
-        start_time = time.time()
-        
-        # Process many messages quickly
+        # With the clock frozen, a burst only drains the user bucket
         message_info = {"user_id": 123, "chat_id": 456}
-        for _ in range(100):
-            await rate_limiter.check_rate_limit(message_info)
+        results = await asyncio.gather(
+            *(rate_limiter.check_rate_limit(message_info) for _ in range(100))
+        )
         
-        end_time = time.time()
+        assert sum(results) == rate_limiter.user_config.bucket_size
         
-        # Should process 100 messages quickly
-        assert end_time - start_time < 1.0
+        # One full refill period later the user may send again
+        fake_clock.advance(rate_limiter.user_config.refill_time)
+        assert await rate_limiter.check_rate_limit(message_info) == True
     
-    @pytest.mark.asyncio
     async def test_intent_classifier_performance(self):
         """Test intent classifier performance."""
         intent_classifier = IntentClassifier()
         
-        import time
-        
         start_time = time.time()
         
-        # Classify many intents
+        # Classify many intents in one batch
         texts = [
             "Show me the news",
             "I want a quiz",
             "Let's debate",
             "Tell me a joke",
             "Help me"
-        ] * 20  # 100 total
-        
-        for text in texts:
-            await intent_classifier.classify_intent(text)
+        ]
+        results = await asyncio.gather(
+            *(intent_classifier.classify_intent(text) for text in texts * 20)  # 100 total
+        )
         
         end_time = time.time()
         
-        # Should classify 100 intents quickly
+        # Should classify 100 intents quickly, and consistently
+        assert results == results[:len(texts)] * 20
         assert end_time - start_time < 2.0
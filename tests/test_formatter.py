@@ -0,0 +1,48 @@
+"""
+Tests for the Telegram message formatter in src/utils/formatter.py.
+"""
+
+import pytest
+
+from src.utils.formatter import MessageFormatter
+
+
+@pytest.fixture(scope="module")
+def formatter():
+    """MessageFormatter instance shared by the module."""
+    return MessageFormatter()
+
+
+class TestBalanceMarkdown:
+    """Test closing of unpaired emphasis markers."""
+    
+    @pytest.mark.parametrize("text,expected", [
+        # Balanced text is left alone
+        ("plain text", "plain text"),
+        ("**bold** and *italic*", "**bold** and *italic*"),
+        ("***both***", "***both***"),
+        # Unpaired bold
+        ("**bold", "**bold**"),
+        ("**a** **b", "**a** **b**"),
+        # Unpaired italic
+        ("*italic", "*italic*"),
+        ("*a* *b", "*a* *b*"),
+        # '***' opens bold then italic, so italic closes first
+        ("***both", "***both***"),
+        # Mixed nesting closes innermost first
+        ("*it **bold", "*it **bold" + "**" + "*"),
+        ("**bold *it", "**bold *it" + "*" + "**"),
+        ("**a *b** c", "**a *b** c*"),
+    ])
+    def test_balance_markdown(self, formatter, text, expected):
+        """Test open markers are closed in reverse opening order."""
+        assert formatter._balance_markdown(text) == expected
+    
+    def test_balanced_output_is_stable(self, formatter):
+        """Test balancing already balanced output changes nothing."""
+        text = formatter._balance_markdown("**bold *it")
+        assert formatter._balance_markdown(text) == text
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,206 @@
+"""
+Tests for the structured logging utilities in utils/logger.py.
+"""
+
+import asyncio
+import json
+import logging
+import queue
+import time
+import pytest
+
+from utils import logger as logger_module
+from utils.logger import (
+    AsyncFileSink, BotLogger, FastStdoutHandler, StructuredFormatter,
+    _BatchedFileMemoryHandler, _StructuredQueueHandler, _StructuredQueueListener,
+    log_admin_action, log_api_call, log_bot_action, log_error, log_user_action
+)
+
+
+def _record(**extra) -> logging.LogRecord:
+    """Build an INFO record with the given extra attributes."""
+    record = logging.LogRecord("test", logging.INFO, __file__, 1, "hello", None, None)
+    record.__dict__.update(extra)
+    return record
+
+
+def _pairs(line: str) -> list:
+    """Decode a JSON log line into its (key, value) pairs, keeping duplicates."""
+    return json.loads(line, object_pairs_hook=list)
+
+
+class TestStructuredFormatter:
+    """Test structured JSON formatting."""
+    
+    def test_extra_fields_spliced(self):
+        """Test log_type and extra fields appear as top-level keys."""
+        line = StructuredFormatter().format(_record(log_type="user_action", extra_fields={"user_id": 1}))
+        entry = dict(_pairs(line))
+        
+        assert entry["message"] == "hello"
+        assert entry["log_type"] == "user_action"
+        assert entry["user_id"] == 1
+    
+    @pytest.mark.parametrize("key", ["message", "level", "log_type"])
+    def test_colliding_extra_field_overrides(self, key):
+        """Test an extra field named like a fixed field overrides it without duplicating the key."""
+        line = StructuredFormatter().format(_record(log_type="user_action", extra_fields={key: "override"}))
+        pairs = _pairs(line)
+        keys = [k for k, _ in pairs]
+        
+        assert len(keys) == len(set(keys))
+        assert dict(pairs)[key] == "override"
+
+
+class TestFastStdoutHandler:
+    """Test the console handler."""
+    
+    def test_writes_after_pending_print_output(self, capsys):
+        """Test log lines follow earlier print() output and go to the captured stdout."""
+        handler = FastStdoutHandler()
+        handler.setFormatter(logging.Formatter("%(message)s"))
+        
+        print("before")
+        handler.handle(_record())
+        print("after")
+        
+        assert capsys.readouterr().out == "before\nhello\nafter\n"
+
+
+class TestStructuredQueueListener:
+    """Test the background listener that owns the real handlers."""
+    
+    def test_flushes_buffered_records_when_idle(self, tmp_path):
+        """Test a buffered error reaches the file once the queue drains, without a timer."""
+        path = tmp_path / "errors.log"
+        file_handler = logging.FileHandler(str(path), delay=True)
+        file_handler.setFormatter(logging.Formatter("%(message)s"))
+        buffered = _BatchedFileMemoryHandler(capacity=1000, flushLevel=logging.CRITICAL, target=file_handler)
+        log_queue = queue.Queue()
+        listener = _StructuredQueueListener(log_queue, buffered)
+        listener.start()
+        try:
+            log_queue.put(_record())
+            deadline = time.monotonic() + 5
+            while not (path.exists() and path.read_text()) and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert path.read_text() == "hello\n"
+        finally:
+            listener.stop()
+            buffered.close()
+    
+    def test_reports_dropped_records_on_stop(self):
+        """Test records dropped by a full queue are summarised by the listener, not lost silently."""
+        seen = []
+        collector = logging.Handler()
+        collector.emit = seen.append
+        log_queue = queue.Queue(maxsize=1)
+        queue_handler = _StructuredQueueHandler(log_queue)
+        listener = _StructuredQueueListener(log_queue, collector, queue_handler=queue_handler, logger_name="test")
+        
+        # Fill the queue before the listener runs so the next two records are dropped
+        for _ in range(3):
+            queue_handler.handle(_record())
+        listener.start()
+        listener.stop()
+        
+        summary = seen[-1]
+        assert summary.levelno == logging.WARNING
+        assert summary.log_type == "dropped"
+        assert summary.extra_fields == {"count": 2}
+        assert queue_handler.dropped == 0
+
+
+class TestLogHelpers:
+    """Test the module-level log helpers."""
+    
+    @pytest.fixture
+    def records(self, monkeypatch):
+        """Records logged through the global BotLogger, kept in memory instead of reaching its handlers."""
+        seen = []
+        collector = logging.Handler()
+        collector.emit = seen.append
+        monkeypatch.setattr(logger_module.logger.logger, "handlers", [collector])
+        return seen
+    
+    @pytest.mark.parametrize("level,expected", [
+        ("exception", logging.ERROR),
+        ("ERROR", logging.ERROR),
+        ("warning", logging.WARNING),
+        ("verbose", logging.INFO),
+    ])
+    def test_helpers_resolve_any_level_name(self, records, level, expected):
+        """Test the helpers never raise on a level name, known or not."""
+        log_user_action(1, 2, "test", level=level)
+        log_bot_action("test", level=level)
+        log_admin_action(1, "test", level=level)
+        
+        assert [record.levelno for record in records] == [expected] * 3
+    
+    def test_exception_level_attaches_traceback(self, records):
+        """Test level="exception" records the current exception like Logger.exception."""
+        try:
+            raise ValueError("boom")
+        except ValueError:
+            log_user_action(1, 2, "test", level="exception")
+        
+        assert records[0].exc_info[0] is ValueError
+    
+    def test_records_attributed_to_helper_caller(self, records):
+        """Test helper records report the calling function, not the helper."""
+        log_user_action(1, 2, "test")
+        log_error(ValueError("boom"), "test")
+        log_api_call("api", "endpoint", "success", 0.1)
+        
+        assert {record.funcName for record in records} == {"test_records_attributed_to_helper_caller"}
+        assert {record.module for record in records} == {"test_logger"}
+
+
+class TestAsyncFileSink:
+    """Test the coroutine error-log sink."""
+    
+    async def test_stop_writes_all_queued_lines(self, tmp_path):
+        """Test stop() lets an in-flight batch finish and drains the queue."""
+        pytest.importorskip("aiofiles")
+        path = tmp_path / "errors.log"
+        sink = AsyncFileSink(str(path))
+        await sink.start()
+        
+        lines = [b"line %d\n" % i for i in range(1000)]
+        for line in lines:
+            sink.put(line)
+        # Let the consumer take a batch and start writing before stopping
+        await asyncio.sleep(0)
+        await sink.stop()
+        
+        assert path.read_bytes() == b"".join(lines)
+
+    
+    async def test_sink_swap_writes_each_error_once(self, tmp_path, monkeypatch):
+        """Test errors logged around start/stop_async_sink reach bot_errors.log exactly once, in order."""
+        pytest.importorskip("aiofiles")
+        monkeypatch.chdir(tmp_path)
+        monkeypatch.setenv("LOG_ASYNC_SINK", "1")
+        monkeypatch.setattr(BotLogger, "_listener", None)
+        bot_logger = BotLogger("test_async_sink_swap")
+        listener = BotLogger._listener
+        # Enough records that some are still queued while the handlers swap
+        expected = []
+        try:
+            for phase in ("before", "during", "after"):
+                for i in range(500):
+                    bot_logger.error("%s %d", phase, i)
+                    expected.append("%s %d" % (phase, i))
+                if phase == "before":
+                    await bot_logger.start_async_sink()
+                elif phase == "during":
+                    await bot_logger.stop_async_sink()
+        finally:
+            listener.stop()
+        
+        lines = (tmp_path / "bot_errors.log").read_text().splitlines()
+        assert [json.loads(line)["message"] for line in lines] == expected
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,3 +1,6 @@
+import asyncio
+import time
+import httpx
 import pytest
 from unittest.mock import AsyncMock, patch
 from fastapi.testclient import TestClient
@@ -6,6 +9,25 @@ from fastapi import HTTPException
 from src.core.webhook import TelegramUpdate, verify_telegram_signature
 from src.core.security import security_manager
 
+@pytest.fixture(autouse=True)
+def _reset_security():
+    """Clear the global security manager's state after each test."""
+    yield
+    security_manager.reset()
+
+async def _post_updates(app, updates):
+    """POST webhook updates to the app concurrently over ASGI."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as ac:
+        return await asyncio.gather(*[
+            ac.post(
+                "/webhook",
+                json=update,
+                headers={"X-Telegram-Bot-Api-Secret-Token": "valid_token"}
+            )
+            for update in updates
+        ])
+
 class TestTelegramUpdate:
     """Test Telegram update validation."""
     
@@ -168,37 +190,20 @@ class TestWebhookPerformance:
     
     def test_concurrent_requests(self, client: TestClient, mock_telegram_update):
         """Test handling of concurrent webhook requests."""
-        import asyncio
-        import time
-        
-        async def send_concurrent_requests():
-            with patch('src.core.webhook.verify_telegram_signature') as mock_verify:
-                mock_verify.return_value = "valid_token"
-                
-                start_time = time.time()
-                
-                # Send multiple concurrent requests
-                tasks = []
-                for i in range(10):
-                    task = asyncio.create_task(
-                        client.post(
-                            "/webhook",
-                            json=mock_telegram_update,
-                            headers={"X-Telegram-Bot-Api-Secret-Token": "valid_token"}
-                        )
-                    )
-                    tasks.append(task)
-                
-                responses = await asyncio.gather(*tasks)
-                end_time = time.time()
-                
-                # All requests should succeed
-                assert all(r.status_code == 200 for r in responses)
-                
-                # Should handle concurrent requests efficiently
-                assert end_time - start_time < 5.0  # Should complete within 5 seconds
-        
-        asyncio.run(send_concurrent_requests())
+        with patch('src.core.webhook.verify_telegram_signature') as mock_verify:
+            mock_verify.return_value = "valid_token"
+            
+            start_time = time.time()
+            
+            # Send multiple concurrent requests
+            responses = asyncio.run(_post_updates(client.app, [mock_telegram_update] * 10))
+            end_time = time.time()
+            
+            # All requests should succeed
+            assert all(r.status_code == 200 for r in responses)
+            
+            # Should handle concurrent requests efficiently
+            assert end_time - start_time < 5.0  # Should complete within 5 seconds
     
     def test_large_batch_processing(self, client: TestClient):
         """Test processing of large batches of updates."""
@@ -221,15 +226,10 @@ class TestWebhookPerformance:
             
             # Process batch
             start_time = time.time()
-            for update in batch_updates:
-                response = client.post(
-                    "/webhook",
-                    json=update,
-                    headers={"X-Telegram-Bot-Api-Secret-Token": "valid_token"}
-                )
-                assert response.status_code == 200
-            
+            responses = asyncio.run(_post_updates(client.app, batch_updates))
             end_time = time.time()
             
+            assert all(r.status_code == 200 for r in responses)
+            
             # Should process batch efficiently
             assert end_time - start_time < 30.0  # Should complete within 30 seconds
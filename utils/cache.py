@@ -3,31 +3,162 @@ Redis cache utility for Kroolo Agent Bot
 Handles caching and rate limiting
 """
 
+import array
+import hashlib
 import json
 import logging
+import socket
+import threading
 import time
-from typing import Optional, Any, Dict
-import redis
+from collections import OrderedDict
+from typing import TYPE_CHECKING, Callable, Optional, Any, Dict, List, Tuple
+
+# redis is imported when a connection is made, so importing this module stays cheap
+if TYPE_CHECKING:
+    import redis
+
+# orjson is a much faster drop-in for the JSON cache payloads
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# xxh3 is a fast non-cryptographic hash, all a cache key needs
+try:
+    import xxhash
+    XXHASH_AVAILABLE = True
+except ImportError:
+    XXHASH_AVAILABLE = False
+
+# msgpack (+ zstd for large values) packs the settings/user blobs tighter than JSON
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
 
 logger = logging.getLogger(__name__)
 
+# Detect dead peers within ~90s instead of the kernel's 2h default (Linux-only options)
+TCP_KEEPALIVE_OPTIONS = {
+    getattr(socket, name): value
+    for name, value in (("TCP_KEEPIDLE", 60), ("TCP_KEEPINTVL", 10), ("TCP_KEEPCNT", 3))
+    if hasattr(socket, name)
+}
+
+# msgpack extension type codes for the values it cannot pack natively
+_EXT_SET = 1
+_EXT_FROZENSET = 2
+_EXT_ARRAY = 3
+
+def _ext_default(obj: Any):
+    """msgpack default= hook: encode sets and arrays as extension types"""
+    if isinstance(obj, (set, frozenset)):
+        code = _EXT_FROZENSET if isinstance(obj, frozenset) else _EXT_SET
+        return msgpack.ExtType(code, msgpack.packb(list(obj), default=_ext_default, use_bin_type=True))
+    if isinstance(obj, array.array):
+        return msgpack.ExtType(_EXT_ARRAY, obj.typecode.encode() + obj.tobytes())
+    raise TypeError(f"Cannot pack {type(obj).__name__} for the cache")
+
+def _ext_hook(code: int, data: bytes):
+    """msgpack ext_hook=: decode the extension types written by _ext_default"""
+    if code in (_EXT_SET, _EXT_FROZENSET):
+        # Members must stay hashable, so sequences come back as tuples
+        items = msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False, use_list=False)
+        return frozenset(items) if code == _EXT_FROZENSET else set(items)
+    if code == _EXT_ARRAY:
+        return array.array(data[:1].decode(), data[1:])
+    return msgpack.ExtType(code, data)
+
+def _dumps(value: Any):
+    """Serialize a cache value to JSON (bytes with orjson, str otherwise)"""
+    if ORJSON_AVAILABLE:
+        # Stringify non-str dict keys the way json.dumps does
+        return orjson.dumps(value, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(value)
+
+def _loads(data) -> Any:
+    """Deserialize a JSON cache value"""
+    if ORJSON_AVAILABLE:
+        return orjson.loads(data)
+    return json.loads(data)
+
 class RedisCache:
+    # Packed values larger than this are zstd-compressed
+    COMPRESS_THRESHOLD = 1024
+    # Upper bound on sockets across all clients, so webhook bursts cannot exhaust
+    # file descriptors. Each client has its own pool, so the bound is split:
+    # the text client serves most calls, the binary client only packed values
+    MAX_CONNECTIONS = 64
+    TEXT_POOL_CONNECTIONS = 32
+    BINARY_POOL_CONNECTIONS = 16
+    ASYNC_POOL_CONNECTIONS = MAX_CONNECTIONS - TEXT_POOL_CONNECTIONS - BINARY_POOL_CONNECTIONS
+    
     def __init__(self, redis_url: str):
         self.redis_url = redis_url
         self.redis_client = None
+        self.binary_client = None
+        self.aioredis_client = None
+        # Called with each key removed through delete/delete_pattern (e.g. to drop local copies)
+        self._delete_listeners: List[Callable[[str], None]] = []
         self._init_redis()
     
     def _init_redis(self):
         """Initialize Redis connection"""
         try:
-            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+            import redis
+            from redis.utils import HIREDIS_AVAILABLE
+            
+            self.redis_client = redis.Redis(connection_pool=self._connection_pool(True, self.TEXT_POOL_CONNECTIONS))
             self.redis_client.ping()
+            # Packed values are bytes, so they need a client that does not decode replies
+            self.binary_client = redis.Redis(connection_pool=self._connection_pool(False, self.BINARY_POOL_CONNECTIONS))
             logger.info("Redis connection established successfully")
+            
+            # redis-py picks the C reply parser automatically when hiredis is installed
+            if not HIREDIS_AVAILABLE:
+                logger.warning("hiredis not installed; Redis replies use the pure-Python parser")
         except Exception as e:
             logger.error(f"Failed to connect to Redis: {e}")
             self.redis_client = None
+            self.binary_client = None
     
-
+    def _connection_pool(self, decode_responses: bool, max_connections: int) -> "redis.ConnectionPool":
+        """Create a bounded connection pool with TCP keepalive and health checks"""
+        import redis
+        
+        # decode_responses is a connection setting, so it has to be given to the pool
+        return redis.ConnectionPool.from_url(
+            self.redis_url,
+            decode_responses=decode_responses,
+            max_connections=max_connections,
+            socket_keepalive=True,
+            socket_keepalive_options=TCP_KEEPALIVE_OPTIONS,
+            health_check_interval=30
+        )
+    
+    async def _init_aioredis(self):
+        """Initialize async Redis connection (redis.asyncio supersedes aioredis)"""
+        try:
+            from redis import asyncio as redis_asyncio
+            
+            self.aioredis_client = redis_asyncio.from_url(
+                self.redis_url,
+                decode_responses=True,
+                max_connections=self.ASYNC_POOL_CONNECTIONS
+            )
+            await self.aioredis_client.ping()
+            logger.info("Async Redis connection established successfully")
+        except Exception as e:
+            logger.error(f"Failed to connect to async Redis: {e}")
+            self.aioredis_client = None
     
     def get(self, key: str) -> Optional[Any]:
         """Get value from cache"""
@@ -37,27 +168,123 @@ class RedisCache:
         try:
             value = self.redis_client.get(key)
             if value:
-                return json.loads(value)
+                return _loads(value)
             return None
         except Exception as e:
             logger.error(f"Failed to get from cache: {e}")
             return None
     
+    def get_with_ttl(self, key: str) -> Tuple[Optional[Any], Optional[float]]:
+        """Get a value and its remaining TTL in seconds (None if the key never expires) in one round trip"""
+        if not self.redis_client:
+            return None, None
+        
+        try:
+            pipe = self.redis_client.pipeline(transaction=False)
+            pipe.get(key)
+            pipe.pttl(key)
+            value, pttl = pipe.execute()
+            if not value:
+                return None, None
+            return _loads(value), (pttl / 1000 if pttl >= 0 else None)
+        except Exception as e:
+            logger.error(f"Failed to get from cache: {e}")
+            return None, None
+    
+    def get_many(self, keys: List[str]) -> List[Optional[Any]]:
+        """Get several values from cache in one round trip"""
+        if not self.redis_client:
+            return [None] * len(keys)
+        
+        try:
+            return [_loads(value) if value else None for value in self.redis_client.mget(keys)]
+        except Exception as e:
+            logger.error(f"Failed to get many from cache: {e}")
+            return [None] * len(keys)
+    
     def set(self, key: str, value: Any, expire: int = 3600) -> bool:
         """Set value in cache with expiration"""
         if not self.redis_client:
             return False
         
         try:
-            serialized_value = json.dumps(value)
+            serialized_value = _dumps(value)
             self.redis_client.setex(key, expire, serialized_value)
             return True
         except Exception as e:
             logger.error(f"Failed to set cache: {e}")
             return False
     
+    @classmethod
+    def _serialize(cls, value: Any) -> bytes:
+        """Pack a value as msgpack, zstd-compressing large payloads
+        
+        The leading byte tags the format: Z (zstd msgpack), M (msgpack) or
+        J (JSON, when msgpack is not installed). Sets and arrays are packed
+        as msgpack extension types; anything else msgpack cannot encode
+        raises TypeError.
+        """
+        if not MSGPACK_AVAILABLE:
+            data = _dumps(value)
+            return b'J' + (data if isinstance(data, bytes) else data.encode())
+        
+        buf = msgpack.packb(value, default=_ext_default, use_bin_type=True)
+        if ZSTD_AVAILABLE and len(buf) > cls.COMPRESS_THRESHOLD:
+            return b'Z' + zstandard.ZstdCompressor(level=3).compress(buf)
+        return b'M' + buf
+    
+    @staticmethod
+    def _deserialize(data: bytes) -> Any:
+        """Unpack a value written by _serialize (or an untagged legacy JSON value)"""
+        tag, payload = data[:1], data[1:]
+        if tag == b'Z':
+            payload = zstandard.ZstdDecompressor().decompress(payload)
+            tag = b'M'
+        if tag == b'M':
+            # strict_map_key=False keeps int dict keys (e.g. user ids) readable
+            return msgpack.unpackb(payload, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+        if tag == b'J':
+            return _loads(payload)
+        # Written by set() before values were tagged; still plain JSON
+        return _loads(data)
+    
+    def get_packed(self, key: str) -> Optional[Any]:
+        """Get a value stored with set_packed"""
+        if not self.binary_client:
+            return None
+        
+        try:
+            value = self.binary_client.get(key)
+            if value:
+                return self._deserialize(value)
+            return None
+        except Exception as e:
+            logger.error(f"Failed to get packed value from cache: {e}")
+            return None
+    
+    def set_packed(self, key: str, value: Any, expire: int = 3600) -> bool:
+        """Set a value in cache as (compressed) msgpack with expiration"""
+        if not self.binary_client:
+            return False
+        
+        try:
+            self.binary_client.setex(key, expire, self._serialize(value))
+            return True
+        except Exception as e:
+            logger.error(f"Failed to set packed cache: {e}")
+            return False
+    
+    def add_delete_listener(self, listener: Callable[[str], None]):
+        """Register a callback run with every key removed by delete or delete_pattern"""
+        self._delete_listeners.append(listener)
+    
+    def _notify_deleted(self, key: str):
+        for listener in self._delete_listeners:
+            listener(key)
+    
     def delete(self, key: str) -> bool:
         """Delete key from cache"""
+        self._notify_deleted(key)
         if not self.redis_client:
             return False
         
@@ -68,6 +295,29 @@ class RedisCache:
             logger.error(f"Failed to delete from cache: {e}")
             return False
     
+    def delete_pattern(self, pattern: str, batch_size: int = 500) -> bool:
+        """Delete all keys matching a glob pattern without blocking Redis"""
+        if not self.redis_client:
+            return False
+        
+        try:
+            # SCAN walks the keyspace incrementally; UNLINK frees memory in the background
+            pipe = self.redis_client.pipeline(transaction=False)
+            queued = 0
+            for key in self.redis_client.scan_iter(match=pattern, count=batch_size):
+                pipe.unlink(key)
+                self._notify_deleted(key)
+                queued += 1
+                if queued >= batch_size:
+                    pipe.execute()
+                    queued = 0
+            if queued:
+                pipe.execute()
+            return True
+        except Exception as e:
+            logger.error(f"Failed to delete pattern from cache: {e}")
+            return False
+    
     def exists(self, key: str) -> bool:
         """Check if key exists in cache"""
         if not self.redis_client:
@@ -100,10 +350,40 @@ class RedisCache:
         except Exception as e:
             logger.error(f"Failed to set expiration: {e}")
             return False
+    
+    def register_script(self, script: str):
+        """Register a Lua script, returning a callable or None if Redis is unavailable"""
+        if not self.redis_client:
+            return None
+        
+        try:
+            return self.redis_client.register_script(script)
+        except Exception as e:
+            logger.error(f"Failed to register script: {e}")
+            return None
 
 class RateLimiter:
     """Rate limiter using Redis with token bucket algorithm"""
     
+    # Count the request against each bucket in order, atomically and in one
+    # round trip. KEYS = bucket keys, ARGV = their limits followed by the
+    # window in seconds. Returns the 1-based index of the first exceeded
+    # limit (later buckets are not counted) or 0 if all allow the request.
+    # The TTL is set only by the first request in a window.
+    RATE_LIMIT_SCRIPT = """
+local window = ARGV[#ARGV]
+for i, key in ipairs(KEYS) do
+    local count = redis.call('INCR', key)
+    if count == 1 then
+        redis.call('EXPIRE', key, window)
+    end
+    if count > tonumber(ARGV[i]) then
+        return i
+    end
+end
+return 0
+"""
+    
     def __init__(self, redis_cache: RedisCache):
         self.cache = redis_cache
         self.default_limits = {
@@ -111,38 +391,32 @@ class RateLimiter:
             "chat": 50,      # 50 requests per minute per chat
             "global": 1000   # 1000 requests per minute globally
         }
+        self._rate_limit_script = self.cache.register_script(self.RATE_LIMIT_SCRIPT)
     
     def check_rate_limit(self, key: str, limit: int, window: int = 60) -> bool:
         """
         Check if rate limit is exceeded
         Returns True if request is allowed, False if rate limited
         """
+        if not self._rate_limit_script:
+            return True  # Allow request if Redis is unavailable
+        
         current_time = int(time.time())
-        bucket_key = f"rate_limit:{key}:{current_time // window}"
+        bucket_key = "rate_limit:%s:%d" % (key, current_time // window)
         
         try:
-            # Get current count
-            current_count = self.cache.get(bucket_key) or 0
-            
-            if current_count >= limit:
-                return False
-            
-            # Increment counter
-            self.cache.increment(bucket_key, 1)
-            self.cache.expire(bucket_key, window)
-            
-            return True
+            return self._rate_limit_script(keys=[bucket_key], args=[limit, window]) == 0
         except Exception as e:
             logger.error(f"Rate limit check failed: {e}")
             return True  # Allow request if rate limiting fails
     
     def check_user_rate_limit(self, user_id: int) -> bool:
         """Check rate limit for specific user"""
-        return self.check_rate_limit(f"user:{user_id}", self.default_limits["user"])
+        return self.check_rate_limit("user:%s" % user_id, self.default_limits["user"])
     
     def check_chat_rate_limit(self, chat_id: int) -> bool:
         """Check rate limit for specific chat"""
-        return self.check_rate_limit(f"chat:{chat_id}", self.default_limits["chat"])
+        return self.check_rate_limit("chat:%s" % chat_id, self.default_limits["chat"])
     
     def check_global_rate_limit(self) -> bool:
         """Check global rate limit"""
@@ -150,83 +424,133 @@ class RateLimiter:
     
     def is_rate_limited(self, user_id: int, chat_id: int) -> bool:
         """Check all applicable rate limits"""
-        # Check global first
-        if not self.check_global_rate_limit():
-            return True
+        if not self._rate_limit_script:
+            return False  # Allow request if Redis is unavailable
         
-        # Check chat limit
-        if not self.check_chat_rate_limit(chat_id):
-            return True
+        window = 60
+        bucket = int(time.time()) // window
         
-        # Check user limit
-        if not self.check_user_rate_limit(user_id):
-            return True
+        # Global first, then chat, then user, all in one script call
+        keys = [
+            "rate_limit:global:%d" % bucket,
+            "rate_limit:chat:%s:%d" % (chat_id, bucket),
+            "rate_limit:user:%s:%d" % (user_id, bucket)
+        ]
+        limits = [
+            self.default_limits["global"],
+            self.default_limits["chat"],
+            self.default_limits["user"]
+        ]
         
-        return False
+        try:
+            return self._rate_limit_script(keys=keys, args=limits + [window]) != 0
+        except Exception as e:
+            logger.error(f"Rate limit check failed: {e}")
+            return False  # Allow request if rate limiting fails
     
     def get_rate_limit_info(self, user_id: int, chat_id: int) -> Dict[str, Any]:
         """Get current rate limit status"""
-        current_time = int(time.time())
         window = 60
+        bucket = int(time.time()) // window
         
-        user_key = f"rate_limit:user:{user_id}:{current_time // window}"
-        chat_key = f"rate_limit:chat:{chat_id}:{current_time // window}"
-        global_key = f"rate_limit:global:{current_time // window}"
-        
-        return {
-            "user": {
-                "current": self.cache.get(user_key) or 0,
-                "limit": self.default_limits["user"],
-                "remaining": max(0, self.default_limits["user"] - (self.cache.get(user_key) or 0))
-            },
-            "chat": {
-                "current": self.cache.get(chat_key) or 0,
-                "limit": self.default_limits["chat"],
-                "remaining": max(0, self.default_limits["chat"] - (self.cache.get(chat_key) or 0))
-            },
-            "global": {
-                "current": self.cache.get(global_key) or 0,
-                "limit": self.default_limits["global"],
-                "remaining": max(0, self.default_limits["global"] - (self.cache.get(global_key) or 0))
-            }
+        keys = {
+            "user": "rate_limit:user:%s:%d" % (user_id, bucket),
+            "chat": "rate_limit:chat:%s:%d" % (chat_id, bucket),
+            "global": "rate_limit:global:%d" % bucket
         }
+        counts = self.cache.get_many(list(keys.values()))
+        
+        info = {}
+        for scope, count in zip(keys, counts):
+            current = count or 0
+            limit = self.default_limits[scope]
+            info[scope] = {
+                "current": current,
+                "limit": limit,
+                "remaining": max(0, limit - current)
+            }
+        return info
 
 class CacheManager:
     """High-level cache manager for common bot operations"""
     
+    # Process-local LRU in front of Redis for AI responses
+    AI_RESPONSE_L1_SIZE = 1024
+    # Longest an entry is served locally, even when Redis holds it longer
+    AI_RESPONSE_L1_TTL = 1800
+    
     def __init__(self, redis_cache: RedisCache):
         self.cache = redis_cache
         self.default_ttl = 3600  # 1 hour
+        self._ai_response_l1 = OrderedDict()  # query_hash -> (response, expires_at)
+        self._ai_response_l1_lock = threading.Lock()
+        self.cache.add_delete_listener(self._forget_ai_response)
     
     def cache_user_data(self, user_id: int, data: Dict[str, Any], ttl: int = None) -> bool:
         """Cache user data"""
         key = f"user:{user_id}"
-        return self.cache.set(key, data, ttl or self.default_ttl)
+        return self.cache.set_packed(key, data, ttl or self.default_ttl)
     
     def get_cached_user_data(self, user_id: int) -> Optional[Dict[str, Any]]:
         """Get cached user data"""
         key = f"user:{user_id}"
-        return self.cache.get(key)
+        return self.cache.get_packed(key)
     
     def cache_community_settings(self, chat_id: int, settings: Dict[str, Any], ttl: int = None) -> bool:
         """Cache community settings"""
         key = f"community:{chat_id}:settings"
-        return self.cache.set(key, settings, ttl or self.default_ttl)
+        return self.cache.set_packed(key, settings, ttl or self.default_ttl)
     
     def get_cached_community_settings(self, chat_id: int) -> Optional[Dict[str, Any]]:
         """Get cached community settings"""
         key = f"community:{chat_id}:settings"
-        return self.cache.get(key)
+        return self.cache.get_packed(key)
+    
+    def make_query_hash(self, prompt: str) -> str:
+        """Hash a prompt into the query_hash used by the AI response cache"""
+        data = prompt.encode()
+        if XXHASH_AVAILABLE:
+            return xxhash.xxh3_64_hexdigest(data)
+        return hashlib.blake2b(data, digest_size=8).hexdigest()
     
     def cache_ai_response(self, query_hash: str, response: str, ttl: int = 1800) -> bool:
-        """Cache AI responses to avoid repeated API calls"""
+        """Cache AI responses to avoid repeated API calls (hash prompts with make_query_hash)"""
         key = f"ai_response:{query_hash}"
+        self._remember_ai_response(query_hash, response, ttl)
         return self.cache.set(key, response, ttl)
     
     def get_cached_ai_response(self, query_hash: str) -> Optional[str]:
-        """Get cached AI response"""
+        """Get cached AI response, checking the local LRU before Redis"""
+        with self._ai_response_l1_lock:
+            entry = self._ai_response_l1.get(query_hash)
+            if entry is not None:
+                response, expires_at = entry
+                if expires_at > time.monotonic():
+                    self._ai_response_l1.move_to_end(query_hash)
+                    return response
+                del self._ai_response_l1[query_hash]
+        
         key = f"ai_response:{query_hash}"
-        return self.cache.get(key)
+        response, remaining = self.cache.get_with_ttl(key)
+        if response is not None:
+            # Never hold the local copy past the key's expiry in Redis
+            self._remember_ai_response(query_hash, response, self.AI_RESPONSE_L1_TTL if remaining is None else remaining)
+        return response
+    
+    def _remember_ai_response(self, query_hash: str, response: str, ttl: float):
+        """Store an AI response in the local LRU for at most AI_RESPONSE_L1_TTL, evicting the oldest entry when full"""
+        ttl = min(ttl, self.AI_RESPONSE_L1_TTL)
+        with self._ai_response_l1_lock:
+            self._ai_response_l1[query_hash] = (response, time.monotonic() + ttl)
+            self._ai_response_l1.move_to_end(query_hash)
+            if len(self._ai_response_l1) > self.AI_RESPONSE_L1_SIZE:
+                self._ai_response_l1.popitem(last=False)
+    
+    def _forget_ai_response(self, key: str):
+        """Drop the local copy of an AI response whose Redis key was deleted"""
+        if key.startswith("ai_response:"):
+            with self._ai_response_l1_lock:
+                self._ai_response_l1.pop(key[len("ai_response:"):], None)
     
     def invalidate_user_cache(self, user_id: int) -> bool:
         """Invalidate user-related cache"""
@@ -235,7 +559,4 @@ class CacheManager:
     
     def invalidate_community_cache(self, chat_id: int) -> bool:
         """Invalidate community-related cache"""
-        pattern = f"community:{chat_id}:*"
-        # Note: Redis doesn't support pattern deletion, so we'd need to implement this differently
-        # For now, just delete the settings
-        return self.cache.delete(f"community:{chat_id}:settings")
+        return self.cache.delete_pattern(f"community:{chat_id}:*")
@@ -3,176 +3,683 @@ Logging utilities for Kroolo Agent Bot
 Structured logging with different levels
 """
 
+import asyncio
+import atexit
+import copy
 import logging
 import json
+import os
+import queue
 import sys
-from datetime import datetime
-from typing import Any, Dict, Optional
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from logging.handlers import MemoryHandler, QueueHandler, QueueListener
+from typing import Any, Callable, Dict, Optional
+
+# orjson encodes log entries much faster than json
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# msgspec encodes the fixed log fields from a typed struct, faster still than orjson
+try:
+    import msgspec
+    MSGSPEC_AVAILABLE = True
+except ImportError:
+    MSGSPEC_AVAILABLE = False
+
+# aiofiles backs the optional coroutine error-log sink (LOG_ASYNC_SINK)
+try:
+    import aiofiles
+    AIOFILES_AVAILABLE = True
+except ImportError:
+    AIOFILES_AVAILABLE = False
+
+# Helper level names to logging levels
+_LEVEL_MAP = {
+    "debug": logging.DEBUG,
+    "info": logging.INFO,
+    "warning": logging.WARNING,
+    "error": logging.ERROR,
+    "exception": logging.ERROR,
+    "critical": logging.CRITICAL
+}
+
+def _helper_level(level: str):
+    """Resolve a helper level name to (logging level, exc_info); unknown names log at INFO"""
+    name = level.lower()
+    # "exception" logs at ERROR with the current traceback, like Logger.exception
+    return _LEVEL_MAP.get(name, logging.INFO), name == "exception"
+
+# log_type values used by the helpers, pre-encoded as JSON members
+_LOG_TYPE_JSON = {
+    log_type: b'"log_type":"%s"' % log_type.encode()
+    for log_type in ("user_action", "bot_action", "admin_action", "error", "rate_limit", "api_call", "dropped")
+}
+
+
+# Per-thread cache of the ISO prefix for the current second
+_TS_CACHE = threading.local()
+
+def _utc_timestamp(created: float) -> str:
+    """Format an epoch time as a UTC ISO timestamp, reformatting the date part only once per second"""
+    sec = int(created)
+    if getattr(_TS_CACHE, "sec", None) != sec:
+        _TS_CACHE.sec = sec
+        _TS_CACHE.prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(sec))
+    return f"{_TS_CACHE.prefix}.{int((created - sec) * 1e6):06d}"
+
+if ORJSON_AVAILABLE:
+    def _encode_entry(log_entry: Dict[str, Any]) -> str:
+        """Encode a log entry dict as JSON"""
+        # Stringify non-str keys in extra fields like json does
+        return orjson.dumps(log_entry, option=orjson.OPT_NON_STR_KEYS).decode()
+else:
+    _encode_entry = json.dumps
+
+if MSGSPEC_AVAILABLE:
+    class LogEntry(msgspec.Struct, omit_defaults=True):
+        """Fixed fields of a structured log line"""
+        timestamp: str
+        level: str
+        logger: str
+        message: str
+        module: str
+        function: Optional[str]
+        line: int
+        exception: Optional[str] = None
+    
+    _msgspec_encode = msgspec.json.Encoder().encode
+    
+    # Keys the struct path emits itself; extra fields reusing one take the dict path
+    _ENTRY_FIELDS = frozenset(LogEntry.__struct_fields__) | {"log_type"}
 
 class StructuredFormatter(logging.Formatter):
     """Custom formatter for structured logging"""
     
-    def format(self, record: logging.LogRecord) -> str:
+    # Rendered tracebacks kept for recurring exceptions
+    EXC_CACHE_SIZE = 128
+    
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._exc_cache = OrderedDict()  # (type, message, frames) -> rendered traceback
+    
+    def formatException(self, ei) -> str:
+        """Format exception info, reusing the rendering of an identical recent traceback"""
+        exc_type, exc, tb = ei
+        # Chained exceptions render their causes too; keep those uncached
+        if exc is None or exc.__cause__ is not None or exc.__context__ is not None:
+            return super().formatException(ei)
+        
+        # Walking the frames is cheap next to rendering them (which reads source lines)
+        key = (exc_type, str(exc), tuple((frame.f_code, lineno) for frame, lineno in traceback.walk_tb(tb)))
+        text = self._exc_cache.get(key)
+        if text is not None:
+            self._exc_cache.move_to_end(key)
+            return text
+        
+        text = super().formatException(ei)
+        self._exc_cache[key] = text
+        if len(self._exc_cache) > self.EXC_CACHE_SIZE:
+            self._exc_cache.popitem(last=False)
+        return text
+    
+    def format(self, record: logging.LogRecord, _encode=_encode_entry, _timestamp=_utc_timestamp) -> str:
         """Format log record as structured JSON"""
+        # Add exception info if present
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        
+        # Helpers pre-format their messages, so skip getMessage() when there
+        # is nothing to interpolate
+        msg = record.msg
+        message = msg if not record.args and type(msg) is str else record.getMessage()
+        
+        if MSGSPEC_AVAILABLE:
+            # Splicing a colliding extra field would duplicate the key, so those
+            # records go through the dict, where extra fields override
+            extra_fields = getattr(record, 'extra_fields', None)
+            if not (extra_fields and _ENTRY_FIELDS.intersection(extra_fields)):
+                return self._format_struct(record, message, _timestamp)
+        
+        # _encode/_timestamp are bound as defaults to skip global lookups per record
         log_entry = {
-            "timestamp": datetime.utcnow().isoformat(),
+            "timestamp": _timestamp(record.created),
             "level": record.levelname,
             "logger": record.name,
-            "message": record.getMessage(),
+            "message": message,
             "module": record.module,
             "function": record.funcName,
             "line": record.lineno
         }
         
+        log_type = getattr(record, 'log_type', None)
+        if log_type:
+            log_entry["log_type"] = log_type
+        
         # Add extra fields if present
-        if hasattr(record, 'extra_fields'):
-            log_entry.update(record.extra_fields)
+        extra_fields = getattr(record, 'extra_fields', None)
+        if extra_fields:
+            log_entry.update(extra_fields)
         
-        # Add exception info if present
-        if record.exc_info:
-            log_entry["exception"] = self.formatException(record.exc_info)
+        if record.exc_text:
+            log_entry["exception"] = record.exc_text
+        
+        return _encode(log_entry)
+    
+    @staticmethod
+    def _format_struct(record: logging.LogRecord, message: str, _timestamp) -> str:
+        """Encode the fixed fields from a LogEntry struct and splice in extra fields"""
+        data = _msgspec_encode(LogEntry(
+            timestamp=_timestamp(record.created),
+            level=record.levelname,
+            logger=record.name,
+            message=message,
+            module=record.module,
+            function=record.funcName,
+            line=record.lineno,
+            exception=record.exc_text
+        ))
         
-        return json.dumps(log_entry)
+        log_type = getattr(record, 'log_type', None)
+        extra_fields = getattr(record, 'extra_fields', None)
+        if not (log_type or extra_fields):
+            return data.decode()
+        
+        # Splice the constant log_type member and the extra fields in as top-level keys
+        parts = [data[:-1]]
+        if log_type:
+            parts.append(_LOG_TYPE_JSON.get(log_type) or _msgspec_encode({"log_type": log_type})[1:-1])
+        if extra_fields:
+            parts.append(_msgspec_encode(extra_fields)[1:-1])
+        return (b",".join(parts) + b"}").decode()
+
+class FastStdoutHandler(logging.Handler):
+    """Write formatted records to the binary buffer behind sys.stdout
+    
+    sys.stdout is looked up per record, so redirection (e.g. pytest capture)
+    is honoured, and its text layer is flushed first so log lines stay in
+    order with pending print() output. Each record is encoded once and
+    written to the buffer in a single write.
+    """
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            line = self.format(record) + "\n"
+            stream = sys.stdout
+            buffer = getattr(stream, "buffer", None)
+            if buffer is None:
+                stream.write(line)
+                stream.flush()
+                return
+            stream.flush()
+            buffer.write(line.encode(getattr(stream, "encoding", None) or "utf-8", "backslashreplace"))
+            buffer.flush()
+        except Exception:
+            self.handleError(record)
+
+class _BatchedFileMemoryHandler(MemoryHandler):
+    """MemoryHandler that writes each flushed batch to its FileHandler in one write
+    
+    The stock MemoryHandler hands records to the target one at a time, and
+    FileHandler flushes its stream after every record, so a flush costs a
+    write syscall per record. Here the batch is formatted, joined and
+    written with a single write and flush.
+    """
+    
+    def flush(self):
+        self.acquire()
+        try:
+            target = self.target
+            if target is not None and self.buffer:
+                lines = [
+                    target.format(record) + target.terminator
+                    for record in self.buffer
+                    if record.levelno >= target.level and target.filter(record)
+                ]
+                target.acquire()
+                try:
+                    if target.stream is None:
+                        target.stream = target._open()
+                    target.stream.write("".join(lines))
+                    target.stream.flush()
+                except Exception:
+                    target.handleError(self.buffer[-1])
+                finally:
+                    target.release()
+            self.buffer.clear()
+        finally:
+            self.release()
+
+class _StructuredQueueHandler(QueueHandler):
+    """QueueHandler for an in-process queue that leaves formatting to the listener"""
+    
+    # Args of these types cannot change before the listener formats them
+    _IMMUTABLE_ARG_TYPES = frozenset((str, int, float, bool, type(None)))
+    
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Keep exc_info and extra fields for StructuredFormatter
+        record = copy.copy(record)
+        args = record.args
+        if args and not (type(args) is tuple and all(type(a) in self._IMMUTABLE_ARG_TYPES for a in args)):
+            # Merge mutable args now since they may change before the listener runs;
+            # scalar args are left for the listener thread to interpolate
+            record.msg = record.getMessage()
+            record.args = None
+        return record
+    
+    def __init__(self, queue):
+        super().__init__(queue)
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+    
+    def enqueue(self, record: logging.LogRecord):
+        # Drop and count rather than block the caller when the listener falls behind
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+    
+    def take_dropped(self) -> int:
+        """Return the number of records dropped since the last call and reset it"""
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        return dropped
+
+class _ListenerCall:
+    """Marker queued between records to run a function on the listener thread"""
+    
+    __slots__ = ("fn", "done")
+    
+    def __init__(self, fn: Callable[[], None]):
+        self.fn = fn
+        self.done = threading.Event()
+
+class _StructuredQueueListener(QueueListener):
+    """QueueListener for a bounded queue that does its housekeeping when idle
+    
+    Whenever a record leaves the queue empty, MemoryHandler targets are
+    flushed, so a burst of errors is written as one batch and a lone error
+    reaches the file as soon as the listener catches up, and a summary is
+    emitted for records the queue handler dropped meanwhile. No timer
+    thread is needed for either.
+    """
+    
+    def __init__(self, queue, *handlers, respect_handler_level: bool = False,
+                 queue_handler: Optional[_StructuredQueueHandler] = None, logger_name: str = ""):
+        super().__init__(queue, *handlers, respect_handler_level=respect_handler_level)
+        self.queue_handler = queue_handler
+        self.logger_name = logger_name
+    
+    def enqueue_sentinel(self):
+        # The queue is bounded; wait for room rather than fail at shutdown
+        self.queue.put(self._sentinel)
+    
+    def call_in_order(self, fn: Callable[[], None]):
+        """Run fn on the listener thread after every record queued so far; blocks until it has run"""
+        call = _ListenerCall(fn)
+        self.queue.put(call)
+        call.done.wait()
+    
+    def handle(self, record: logging.LogRecord):
+        if type(record) is _ListenerCall:
+            try:
+                record.fn()
+            finally:
+                record.done.set()
+        else:
+            super().handle(record)
+        if self.queue.empty():
+            self._on_idle()
+    
+    def stop(self):
+        # Already stopped explicitly before the atexit hook runs
+        if self._thread is None:
+            return
+        super().stop()
+        # The sentinel may have been queued behind the last record
+        self._on_idle()
+    
+    def _on_idle(self):
+        """Report dropped records and flush the buffering handlers once the queue has drained"""
+        dropped = self.queue_handler.take_dropped() if self.queue_handler is not None else 0
+        if dropped:
+            record = logging.LogRecord(
+                self.logger_name, logging.WARNING, __file__, 0,
+                "Dropped %d log records (queue full)", (dropped,), None
+            )
+            record.log_type = "dropped"
+            record.extra_fields = {"count": dropped}
+            # Straight to the handlers; the queue is what overflowed
+            super().handle(record)
+        for handler in self.handlers:
+            if isinstance(handler, MemoryHandler):
+                handler.flush()
+
+class AsyncFileSink:
+    """Append log lines to a file from an asyncio task, without threads
+    
+    put() only enqueues; a consumer task started with start() writes the
+    lines in batches through aiofiles. When the queue is full lines are
+    dropped and counted rather than blocking the event loop.
+    """
+    
+    BATCH_SIZE = 256
+    
+    def __init__(self, path: str, maxsize: int = 10_000):
+        self.path = path
+        self.dropped = 0
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._fh = None
+    
+    def put(self, line: bytes):
+        """Enqueue a line, handing off to the loop when called from another thread"""
+        loop = self._loop
+        if loop is not None and loop.is_running():
+            try:
+                running = asyncio.get_running_loop()
+            except RuntimeError:
+                running = None
+            if running is not loop:
+                loop.call_soon_threadsafe(self._put, line)
+                return
+        self._put(line)
+    
+    def _put(self, line: bytes):
+        try:
+            self._queue.put_nowait(line)
+        except asyncio.QueueFull:
+            self.dropped += 1
+    
+    async def start(self):
+        """Open the file and start the consumer task on the running loop"""
+        self._loop = asyncio.get_running_loop()
+        self._fh = await aiofiles.open(self.path, "ab")
+        self._task = asyncio.create_task(self._drain())
+    
+    async def _drain(self):
+        """Write queued lines in batches until the stop sentinel (None) is dequeued"""
+        while True:
+            batch = [await self._queue.get()]
+            while batch[-1] is not None and not self._queue.empty() and len(batch) < self.BATCH_SIZE:
+                batch.append(self._queue.get_nowait())
+            stopping = batch[-1] is None
+            if stopping:
+                batch.pop()
+            if batch:
+                await self._fh.write(b"".join(batch))
+                await self._fh.flush()
+            if stopping:
+                return
+    
+    async def stop(self):
+        """Write out queued lines, then stop the consumer and close the file"""
+        if self._task is None:
+            return
+        # The sentinel queues behind every pending line, so the consumer
+        # finishes its current write and drains the rest before returning
+        if not self._task.done():
+            await self._queue.put(None)
+        try:
+            await self._task
+        finally:
+            await self._fh.close()
+            self._task = None
+            self._loop = None
+
+class _AsyncSinkHandler(logging.Handler):
+    """Handler that formats records and hands the line to an AsyncFileSink"""
+    
+    def __init__(self, sink: AsyncFileSink, level: int = logging.NOTSET):
+        super().__init__(level)
+        self.sink = sink
+    
+    def emit(self, record: logging.LogRecord):
+        try:
+            self.sink.put(self.format(record).encode() + b"\n")
+        except Exception:
+            self.handleError(record)
 
 class BotLogger:
     """Centralized logger for the bot"""
     
+    # Background listener that owns the real handlers
+    _listener: Optional[QueueListener] = None
+    # Records queued for the listener before new ones are dropped
+    QUEUE_MAXSIZE = 100_000
+    # Error-file records buffered until the queue drains (MemoryHandler counts records)
+    ERROR_BUFFER_CAPACITY = 8192
+    
     def __init__(self, name: str = "krooloAgentBot", level: str = "INFO"):
         self.logger = logging.getLogger(name)
         self.logger.setLevel(getattr(logging, level.upper()))
+        self.async_sink: Optional[AsyncFileSink] = None
+        self._async_sink_handler: Optional[logging.Handler] = None
+        self._error_file_handler: Optional[logging.Handler] = None
         
         # Prevent duplicate handlers
         if not self.logger.handlers:
             self._setup_handlers()
     
     def _setup_handlers(self):
-        """Setup console and file handlers"""
+        """Setup console and file handlers behind a queue
+        
+        Log calls only enqueue the record; a background QueueListener thread
+        formats it and does the stdout/disk I/O, so the event loop never
+        blocks on logging.
+        """
+        handlers = []
+        
         # Console handler
-        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler = FastStdoutHandler()
         console_handler.setLevel(logging.INFO)
         console_formatter = StructuredFormatter()
         console_handler.setFormatter(console_formatter)
-        self.logger.addHandler(console_handler)
+        handlers.append(console_handler)
         
         # File handler for errors
+        file_error = None
         try:
-            file_handler = logging.FileHandler("bot_errors.log")
+            file_handler = logging.FileHandler("bot_errors.log", delay=True)
             file_handler.setLevel(logging.ERROR)
             file_formatter = StructuredFormatter()
             file_handler.setFormatter(file_formatter)
-            self.logger.addHandler(file_handler)
+            
+            # Batch error-file writes; the listener flushes whenever the queue
+            # drains, and CRITICAL records or a full buffer flush immediately.
+            # Set LOG_UNBUFFERED=1 to write every record straight through
+            if os.getenv("LOG_UNBUFFERED"):
+                self._error_file_handler = file_handler
+            else:
+                buffered_handler = _BatchedFileMemoryHandler(
+                    capacity=self.ERROR_BUFFER_CAPACITY,
+                    flushLevel=logging.CRITICAL,
+                    target=file_handler
+                )
+                buffered_handler.setLevel(logging.ERROR)
+                # Runs after listener.stop (atexit is LIFO), once the queue is drained
+                atexit.register(buffered_handler.close)
+                self._error_file_handler = buffered_handler
+            handlers.append(self._error_file_handler)
         except Exception as e:
+            file_error = e
+        
+        if os.getenv("LOG_ASYNC_SINK") and AIOFILES_AVAILABLE:
+            # Coroutine sink on the event loop; it only replaces the file handler
+            # once start_async_sink() runs, so entry points that never start it
+            # keep writing the error log through the listener
+            self.async_sink = AsyncFileSink("bot_errors.log")
+            self._async_sink_handler = _AsyncSinkHandler(self.async_sink, logging.ERROR)
+            self._async_sink_handler.setFormatter(StructuredFormatter())
+        
+        log_queue = queue.Queue(maxsize=self.QUEUE_MAXSIZE)
+        queue_handler = _StructuredQueueHandler(log_queue)
+        self.logger.addHandler(queue_handler)
+        
+        listener = _StructuredQueueListener(
+            log_queue, *handlers, respect_handler_level=True,
+            queue_handler=queue_handler, logger_name=self.logger.name
+        )
+        listener.start()
+        # Flush queued records on shutdown
+        atexit.register(listener.stop)
+        BotLogger._listener = listener
+        
+        if file_error:
             # If file logging fails, just log to console
-            self.logger.warning(f"Failed to setup file logging: {e}")
+            self.logger.warning(f"Failed to setup file logging: {file_error}")
     
-    def info(self, message: str, extra_fields: Optional[Dict[str, Any]] = None):
-        """Log info message with optional extra fields"""
-        if extra_fields:
-            self.logger.info(message, extra={"extra_fields": extra_fields})
-        else:
-            self.logger.info(message)
+    async def start_async_sink(self):
+        """Start the coroutine error-log sink and move error records onto it, if LOG_ASYNC_SINK enabled it"""
+        listener = BotLogger._listener
+        if not self.async_sink or listener is None or self._async_sink_handler in listener.handlers:
+            return
+        await self.async_sink.start()
+        # Swap on the listener thread between records: everything queued so far
+        # is written (and flushed) by the file handler, everything after by the sink
+        await asyncio.to_thread(
+            listener.call_in_order,
+            lambda: self._swap_listener_handler(self._error_file_handler, self._async_sink_handler)
+        )
     
-    def warning(self, message: str, extra_fields: Optional[Dict[str, Any]] = None):
-        """Log warning message with optional extra fields"""
-        if extra_fields:
-            self.logger.warning(message, extra={"extra_fields": extra_fields})
-        else:
-            self.logger.warning(message)
+    async def stop_async_sink(self):
+        """Flush and stop the coroutine error-log sink, handing error records back to the file handler"""
+        listener = BotLogger._listener
+        if not self.async_sink or listener is None or self._async_sink_handler not in listener.handlers:
+            return
+        # Lines the sink was handed before the swap are scheduled on the loop
+        # ahead of this coroutine resuming, so stop() writes them all
+        await asyncio.to_thread(
+            listener.call_in_order,
+            lambda: self._swap_listener_handler(self._async_sink_handler, self._error_file_handler)
+        )
+        await self.async_sink.stop()
+        if self.async_sink.dropped:
+            self.logger.warning(f"Async log sink dropped {self.async_sink.dropped} records (queue full)")
     
-    def error(self, message: str, extra_fields: Optional[Dict[str, Any]] = None):
-        """Log error message with optional extra fields"""
-        if extra_fields:
-            self.logger.error(message, extra={"extra_fields": extra_fields})
-        else:
-            self.logger.error(message)
+    def _swap_listener_handler(self, old: Optional[logging.Handler], new: Optional[logging.Handler]):
+        """Replace one of the queue listener's handlers with another, flushing the one removed"""
+        listener = BotLogger._listener
+        handlers = [h for h in listener.handlers if h is not old]
+        if new is not None:
+            handlers.append(new)
+        listener.handlers = tuple(handlers)
+        if old is not None:
+            # The listener only flushes handlers it still owns
+            old.flush()
     
-    def critical(self, message: str, extra_fields: Optional[Dict[str, Any]] = None):
-        """Log critical message with optional extra fields"""
-        if extra_fields:
-            self.logger.critical(message, extra={"extra_fields": extra_fields})
-        else:
-            self.logger.critical(message)
+    def __getattr__(self, name: str):
+        """Delegate info/warning/error/critical/exception straight to the underlying logger"""
+        return getattr(self.logger, name)
     
-    def exception(self, message: str, extra_fields: Optional[Dict[str, Any]] = None):
-        """Log exception with traceback"""
-        if extra_fields:
-            self.logger.exception(message, extra={"extra_fields": extra_fields})
-        else:
-            self.logger.exception(message)
+    def _emit(self, lvl: int, message: str, *args, extra_fields: Optional[Dict[str, Any]] = None,
+              log_type: Optional[str] = None, exc_info: bool = False):
+        """Log message % args at lvl with optional extra fields, log type and traceback"""
+        extra = {"extra_fields": extra_fields, "log_type": log_type} if extra_fields or log_type else None
+        # Helpers always call _emit directly, so stacklevel=3 skips _emit and
+        # the helper and attributes the record to the helper's caller
+        self.logger.log(lvl, message, *args, extra=extra, exc_info=exc_info, stacklevel=3)
 
 # Global logger instance
 logger = BotLogger()
 
+# Bound once so the helpers below skip the attribute lookups on every call
+_is_enabled = logger.logger.isEnabledFor
+_emit = logger._emit
+
 def log_user_action(user_id: int, chat_id: int, action: str, details: str = "", level: str = "info"):
     """Log user actions with structured data"""
+    lvl, exc_info = _helper_level(level)
+    if not _is_enabled(lvl):
+        return
+    
     extra_fields = {
         "user_id": user_id,
         "chat_id": chat_id,
         "action": action,
-        "details": details,
-        "log_type": "user_action"
+        "details": details
     }
     
-    getattr(logger, level)(f"User action: {action}", extra_fields)
+    _emit(lvl, "User action: %s", action, extra_fields=extra_fields, log_type="user_action", exc_info=exc_info)
 
 def log_bot_action(action: str, details: str = "", level: str = "info"):
     """Log bot actions with structured data"""
+    lvl, exc_info = _helper_level(level)
+    if not _is_enabled(lvl):
+        return
+    
     extra_fields = {
         "action": action,
-        "details": details,
-        "log_type": "bot_action"
+        "details": details
     }
     
-    getattr(logger, level)(f"Bot action: {action}", extra_fields)
+    _emit(lvl, "Bot action: %s", action, extra_fields=extra_fields, log_type="bot_action", exc_info=exc_info)
 
 def log_admin_action(admin_id: int, action: str, target: str = "", details: str = "", level: str = "info"):
     """Log admin actions with structured data"""
+    lvl, exc_info = _helper_level(level)
+    if not _is_enabled(lvl):
+        return
+    
     extra_fields = {
         "admin_id": admin_id,
         "action": action,
         "target": target,
-        "details": details,
-        "log_type": "admin_action"
+        "details": details
     }
     
-    getattr(logger, level)(f"Admin action: {action} on {target}", extra_fields)
+    _emit(lvl, "Admin action: %s on %s", action, target, extra_fields=extra_fields, log_type="admin_action", exc_info=exc_info)
 
 def log_error(error: Exception, context: str = "", extra_fields: Optional[Dict[str, Any]] = None):
     """Log errors with context and optional extra fields"""
+    if not _is_enabled(logging.ERROR):
+        return
+    
+    error_message = str(error)
     error_fields = {
         "error_type": type(error).__name__,
-        "error_message": str(error),
-        "context": context,
-        "log_type": "error"
+        "error_message": error_message,
+        "context": context
     }
     
     if extra_fields:
         error_fields.update(extra_fields)
     
-    logger.error(f"Error in {context}: {str(error)}", error_fields)
+    _emit(logging.ERROR, "Error in %s: %s", context, error_message, extra_fields=error_fields, log_type="error")
 
 def log_rate_limit(user_id: int, chat_id: int, action: str):
     """Log rate limit events"""
+    if not _is_enabled(logging.WARNING):
+        return
+    
     extra_fields = {
         "user_id": user_id,
         "chat_id": chat_id,
-        "action": action,
-        "log_type": "rate_limit"
+        "action": action
     }
     
-    logger.warning(f"Rate limit exceeded for user {user_id} in chat {chat_id}", extra_fields)
+    _emit(logging.WARNING, "Rate limit exceeded for user %s in chat %s", user_id, chat_id, extra_fields=extra_fields, log_type="rate_limit")
 
 def log_api_call(api_name: str, endpoint: str, status: str, response_time: float, extra_fields: Optional[Dict[str, Any]] = None):
     """Log API calls with performance metrics"""
+    if not _is_enabled(logging.INFO):
+        return
+    
     api_fields = {
         "api_name": api_name,
         "endpoint": endpoint,
         "status": status,
-        "response_time": response_time,
-        "log_type": "api_call"
+        "response_time": response_time
     }
     
     if extra_fields:
         api_fields.update(extra_fields)
     
-    logger.info(f"API call to {api_name}: {endpoint} - {status} ({response_time:.2f}s)", api_fields)
+    _emit(logging.INFO, "API call to %s: %s - %s (%.2fs)", api_name, endpoint, status, response_time, extra_fields=api_fields, log_type="api_call")
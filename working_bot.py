@@ -6,6 +6,7 @@ This bot will actually process and respond to Telegram messages
 
 import asyncio
 import logging
+import signal
 from telegram.ext import Application
 from app import bot, application, register_handlers, redis_cache
 
@@ -42,14 +43,25 @@ async def main():
         print("💡 Send /start to your bot on Telegram - it will respond now!")
         print("🛑 Press Ctrl+C to stop")
         
-        # Keep the bot running
-        while True:
-            await asyncio.sleep(1)
+        # Keep the bot running until SIGINT/SIGTERM
+        loop = asyncio.get_running_loop()
+        stop = asyncio.Event()
+        loop.add_signal_handler(signal.SIGINT, stop.set)
+        loop.add_signal_handler(signal.SIGTERM, stop.set)
+        await stop.wait()
+        print("\n🛑 Bot stopped by user")
             
     except Exception as e:
         print(f"❌ Error starting bot: {e}")
         import traceback
         traceback.print_exc()
+    finally:
+        # Shut down cleanly so pending updates and buffered logs are flushed
+        if application.updater and application.updater.running:
+            await application.updater.stop()
+        if application.running:
+            await application.stop()
+        await application.shutdown()
 
 if __name__ == "__main__":
     try: